@@ -1,7 +1,62 @@
+from functools import lru_cache
+
 from classes import Contact
 from netCDF4 import Dataset
 import numpy as np
 
+
+# Contacts are found in time order for each satellite, so consecutive contacts tend to
+# fall on the same few days. Keep those days' grids in memory rather than re-reading
+# the file for every contact.
+@lru_cache(maxsize=16)
+def read_cloud_grid(nc_f: str, fraction_type: str) -> tuple:
+    """
+    Return the (lats, lons, cloud fraction) arrays held in a daily NetCDF cloud file
+    """
+    with Dataset(nc_f, 'r') as nc_fid:  # Dataset is the class behavior to open the file and create an instance of the ncCDF4 class
+        lats = nc_fid.variables['lat'][:]  # extract/copy the data
+        lons = nc_fid.variables['lon'][:]
+        cfc = nc_fid.variables[fraction_type][:]
+    return lats, lons, cfc
+
+
+def _between(axis: np.ndarray, low: float, high: float) -> slice:
+    """
+    Return the slice of a sorted (ascending or descending) axis strictly between two values
+    """
+    if axis[0] > axis[-1]:
+        n = len(axis)
+        return slice(
+            n - np.searchsorted(axis[::-1], high, side='left'),
+            n - np.searchsorted(axis[::-1], low, side='right'))
+    return slice(
+        np.searchsorted(axis, low, side='right'), np.searchsorted(axis, high, side='left'))
+
+
+def mean_cloud_fraction_in_box(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    cfc: np.ndarray,
+    lat: float,
+    lon: float,
+    half_width: float = 0.2
+) -> float:
+    """
+    Return the mean cloud fraction within a lat/lon box, centred on a location
+
+    :param lats: Sorted latitudes of the cloud grid (degrees)
+    :param lons: Sorted longitudes of the cloud grid (degrees)
+    :param cfc: Cloud fraction grid, of shape (time, lat, lon)
+    :param lat: Latitude at the centre of the box (degrees)
+    :param lon: Longitude at the centre of the box (degrees)
+    :param half_width: Half the width of the box (degrees)
+    :return:
+    """
+    indlat = _between(lats, lat - half_width, lat + half_width)
+    indlon = _between(lons, lon - half_width, lon + half_width)
+    return np.mean(cfc[0, indlat, indlon])
+
+
 # Astrids code, just making it into a function
 def get_cloud_fraction_from_nc_file(
     c: Contact,
@@ -25,26 +80,12 @@ def get_cloud_fraction_from_nc_file(
     if contact_year=='2018':
         nc_f = f"Global_Cloud_Data_{contact_year}/CFCdm{contact_date}000000219AVPOSE1GL.nc"  # Your filename
 
-    nc_fid = Dataset(nc_f, 'r')  # Dataset is the class behavior to open the file and create an instance of the ncCDF4 class
-
-    lats = nc_fid.variables['lat'][:]  # extract/copy the data
-    lons = nc_fid.variables['lon'][:]
-
     # string 'cfc_day' indicates im only pulling the mean cloud cover from the daytime hours
-    cfc = nc_fid.variables[fraction_type][:]
+    lats, lons, cfc = read_cloud_grid(nc_f, fraction_type)
 
     lat = c.target.location.latitude.degrees
     lon = c.target.location.longitude.degrees
 
-    minlat = lat - 0.2
-    maxlat = lat + 0.2
-
-    minlon = lon - 0.2
-    maxlon = lon + 0.2
-
-    indlat = np.where((lats < maxlat) & (lats > minlat))
-    indlon = np.where((lons < maxlon) & (lons > minlon))
-
-    cfc_day = np.mean(cfc[0,indlat[:],indlon[:]])
+    cfc_day = mean_cloud_fraction_in_box(lats, lons, cfc, lat, lon)
     
     return cfc_day
\ No newline at end of file
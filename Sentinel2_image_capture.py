@@ -1,4 +1,4 @@
-import os
+import numpy as np
 
 from datetime import datetime
 from suntime import Sun
@@ -6,8 +6,9 @@ from Astrid import get_cloud_fraction_from_nc_file
 from skyfield.api import load, utc
 from math import radians, degrees
 from classes import Location, Spacecraft, Contact
-from space import  fetch_tle_and_write_to_txt, for_elevation_from_half_angle
+from space import  get_tle_file, for_elevation_from_half_angle, find_passes, get_platform_type
 from ground import find_city_location
+from timescale import TS
 import time 
 
 start_Walltime=time.time()
@@ -50,13 +51,10 @@ PLATFORM_ATTRIBS = {
 time_start = str(start)[0:10]
 time_end = str(end)[0:10]
 
-file_tle = f"tle_data//{platform}_tle_{time_start}_{time_end}.txt"
-if not os.path.isfile(file_tle):  # If TLE file doesn't already exist, create it.
-	file_norad = f"norad_ids//{platform}_ids.txt"
-	fetch_tle_and_write_to_txt(file_tle, file_norad, time_start, time_end)
+file_tle = get_tle_file(platform, time_start, time_end)  # Fetched if it doesn't already exist
 
 
-sats=load.tle_file(file_tle)
+sats=load.tle_file(file_tle, ts=TS)
 
 # satellites={}
 # for s in load.tle_file(file_tle):
@@ -71,17 +69,15 @@ for satellite in sats:
     if satname=='TBA - TO BE ASSIGNED':
         continue
     
-    spacecraft_all.append(Spacecraft(		satellite,
-		[  # Field of regard (half angle, radians)
-			# we are associating all keys in PLATFORM_ATTRIBS["for"] with 'x' and then itterating over them
-			PLATFORM_ATTRIBS["for"][x] for x in PLATFORM_ATTRIBS["for"]
-			if x in satname
-		][0],
-		[  # Probability a location within the FoR will be acquired
-			PLATFORM_ATTRIBS["aq_prob"][x] for x in PLATFORM_ATTRIBS["aq_prob"]
-			if x in satname
-		][0]
-  ))
+    platform_type = get_platform_type(satname, PLATFORM_ATTRIBS)
+    spacecraft_all.append(Spacecraft(
+        satellite,
+        PLATFORM_ATTRIBS["for"][platform_type],  # Field of regard (half angle, radians)
+        PLATFORM_ATTRIBS["aq_prob"][platform_type]  # Probability a location within the FoR will be acquired
+    ))
+
+# End of the search, which is the same for every target and satellite
+end_ts = TS.from_datetime(end.astimezone(utc))
 
 # Initialise a list of contacts and dictionary for storing results
 Totalcontacts = []
@@ -95,14 +91,44 @@ fullContactCount={}
 
 # for each target, run through each spacecraft and find each contact event.
 # run through each cloud fraction threshold and count the contacts that meet them.
-for target in Targets:
-    target_location=Location(target, find_city_location(target, "lat_lon_data/coverage_lat_lng.csv"))
-    Targetcontact_num={}
-    for i in cloud_thresholds:
-        Targetcontact_num[i]=0
+# Look up the location of every target once, up front
+target_locations = {
+    target: Location(target, find_city_location(target, "lat_lon_data/coverage_lat_lng.csv"))
+    for target in Targets
+}
+
+# Set the elevation angle above the horizon that defines "contact", for each TLE.
+# This only depends on the spacecraft, so it is the same for every target
+elev_angles = {
+    id(s): degrees(for_elevation_from_half_angle(s.for_, s.satellite.model.altp * R_E))
+    for s in spacecraft_all
+}
+
+# Each TLE is used from its own epoch until the epoch of the next TLE of the same
+# satellite (or the end of the search). These windows are the same for every target,
+# so are found once here, and as each TLE is then propagated over the same times for
+# every target its positions are taken from space's cache after the first
+tle_windows = []
+for nextEpoch, s in enumerate(spacecraft_all, start=1):
+    satname=s.satellite.name
+    t0_ts = TS.ut1_jd(s.satellite.epoch.ut1)
+    
+    # If the next satellite is different or there are no more TLEs to check, 
+    # run to the final date. Otherwise just use next epoch
+    if nextEpoch>len(spacecraft_all)-1 or spacecraft_all[nextEpoch].satellite.name!=satname:
+        t1_ts = end_ts
+    else:
+        t1_ts = TS.ut1_jd(spacecraft_all[nextEpoch].satellite.epoch.ut1)
     
+    # if the epochs are the same (sometimes they are for some reason) just move to the next one
+    if t0_ts==t1_ts:
+        continue
+    tle_windows.append((s, t0_ts, t1_ts))
+
+for target in Targets:
+    target_location=target_locations[target]
     cf_alltotal=0
-    cf_daytotal=0
+    cf_day=[]
     allcontactCount=0
     
     # initialise sun for the target location
@@ -111,54 +137,13 @@ for target in Targets:
     
     sun= Sun(lat, lon)
     
-    nextEpoch=0
-    satname=spacecraft_all[0].satellite.name
-    next_satname=satname
-    
     # For each satellite<>location pair, get all contact events during the horizon
-    for s in spacecraft_all:
-        nextEpoch+=1
-        satname=s.satellite.name
-        
-        # When we reach the end of the list, dont update next name
-        if nextEpoch<=len(spacecraft_all)-1:
-            next_satname=spacecraft_all[nextEpoch].satellite.name
-            
-        t0_ts = load.timescale().ut1_jd(s.satellite.epoch.ut1)
+    for s, t0_ts, t1_ts in tle_windows:
+        # Get all contact events for this TLE, during the time it was the latest TLE available
+        _, t_rise_all, t_peak_all, t_set_all = find_passes(
+            [s.satellite], target_location.location, t0_ts, t1_ts, elev_angles[id(s)])
         
-        # If the next satellite is different or there are no more TLEs to check, 
-        # run to the final date. Otherwise just use next epoch
-        if next_satname!=satname or nextEpoch>len(spacecraft_all)-1:
-            t1_ts = load.timescale().from_datetime(end.astimezone(utc))
-        else:
-            t1_ts = load.timescale().ut1_jd(spacecraft_all[nextEpoch].satellite.epoch.ut1)
-        
-        # if the epochs are the same (sometimes they are for some reason) just move to the next loop
-        if t0_ts==t1_ts:
-            continue
-        
-        # Set the elevation angle above the horizon that defines "contact",
-	    # depending on whether the location is a Target or Ground Station
-        elev_angle = degrees(for_elevation_from_half_angle(
-			s.for_,s.satellite.model.altp * R_E))
-        
-        t, events = s.satellite.find_events(
-			target_location.location, t0_ts,t1_ts, altitude_degrees=elev_angle)
-        # Pre-set times
-        t_rise = start
-        t_peak= start
-        
-        for ti, event in zip(t, events):
-            day_night=bool()
-            
-            # if event is 0, it is a rise event, 1 is a peak. If it's neither, instantiate
-            if event == 0:
-                t_rise = ti
-                continue
-            if event == 1:
-                t_peak = ti
-                continue
-            
+        for t_rise, t_peak, ti in zip(t_rise_all, t_peak_all, t_set_all):
             newContact=Contact(s, target_location, t_rise, t_peak, ti)
             Totalcontacts.append(newContact)
             allcontactCount+=1
@@ -196,22 +181,19 @@ for target in Targets:
             # If rise and peak are defined AND they happened in the daytime, Instantiate event
             usefulContact=newContact
             
-            # now store cloud fraction during contact, if too high, skip it. Otherwise record contact
-            cf_daytotal=cf_daytotal+cf
-
-            for ct in cloud_thresholds:
-                
-                if cf > ct:
-                    continue
-                
-                Targetcontact_num[ct]+=1
+            # now store cloud fraction during contact, the contacts that meet each threshold are counted below
+            cf_day.append(cf)
         
             daycontacts.append(usefulContact)
       
        
         
         
-    cf_daymean[target]=cf_daytotal/Targetcontact_num[100]
+    # Count the daytime contacts that aren't above each cloud fraction threshold in one go
+    cf_day=np.asarray(cf_day)
+    Targetcontact_num={ct: int(np.count_nonzero(~(cf_day > ct))) for ct in cloud_thresholds}
+
+    cf_daymean[target]=cf_day.sum()/Targetcontact_num[100]
     cf_allmean[target]=cf_alltotal/allcontactCount
     fullContactCount[target]=allcontactCount
     contact_per_tar[target]=Targetcontact_num
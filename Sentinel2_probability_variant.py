@@ -1,5 +1,3 @@
-import os
-
 from datetime import datetime
 
 from suntime import Sun
@@ -7,8 +5,9 @@ from Astrid import get_cloud_fraction_from_nc_file
 from skyfield.api import load, utc
 from math import radians, degrees
 from classes import Location, Spacecraft, Contact
-from space import  fetch_tle_and_write_to_txt, for_elevation_from_half_angle
+from space import  get_tle_file, for_elevation_from_half_angle, find_passes_parallel, get_platform_type
 from ground import find_city_location
+from timescale import TS
 
 # NOTE: A lot of the code is patched together from chris's scripts and adapted. Also adapted some code from Astrid.
 # The script gathers TLE data from a constellation during the given timeframe... 
@@ -50,131 +49,123 @@ PLATFORM_ATTRIBS = {
 time_start = str(start)[0:10]
 time_end = str(end)[0:10]
 
-file_tle = f"tle_data//{platform}_tle_{time_start}_{time_end}.txt"
-if not os.path.isfile(file_tle):  # If TLE file doesn't already exist, create it.
-	file_norad = f"norad_ids//{platform}_ids.txt"
-	fetch_tle_and_write_to_txt(file_tle, file_norad, time_start, time_end)
+file_tle = get_tle_file(platform, time_start, time_end)  # Fetched if it doesn't already exist
 
 satellites={}
-for s in load.tle_file(file_tle):
+for s in load.tle_file(file_tle, ts=TS):
       satellites[s.model.satnum]=s
 
 # Create Spacecraft objects for each item in the TLE dataset
 spacecraft_all = []
 for satellite_id, satellite in satellites.items():
+	platform_type = get_platform_type(satellite.name, PLATFORM_ATTRIBS)
 	spacecraft_all.append(Spacecraft(
 		satellite,
-		[  # Field of regard (half angle, radians)
-			# we are associating all keys in PLATFORM_ATTRIBS["for"] with 'x' and then itterating over them
-			PLATFORM_ATTRIBS["for"][x] for x in PLATFORM_ATTRIBS["for"]
-			if x in satellite.name
-		][0],
-		[  # Probability a location within the FoR will be acquired
-			PLATFORM_ATTRIBS["aq_prob"][x] for x in PLATFORM_ATTRIBS["aq_prob"]
-			if x in satellite.name
-		][0]
-	))      
-
-# Initialise a list of contacts and disctionary for storing results
-contacts = []
-contact_per_tar={}
-
-# for each target, run through each spacecraft and find each contact event.
-# run through each cloud fraction threshold and count the contacts that meet them.
-for target in Targets:
-    target_location=Location(target, find_city_location(target, "lat_lon_data/coverage_lat_lng.csv"))
+		PLATFORM_ATTRIBS["for"][platform_type],  # Field of regard (half angle, radians)
+		PLATFORM_ATTRIBS["aq_prob"][platform_type]  # Probability a location within the FoR will be acquired
+	))
+
+# Start/End of the search, which are the same for every target
+t0_ts = TS.from_datetime(start.astimezone(utc))
+t1_ts = TS.from_datetime(end.astimezone(utc))
+
+# Look up the location of every target once, up front
+target_locations = {
+    target: Location(target, find_city_location(target, "lat_lon_data/coverage_lat_lng.csv"))
+    for target in Targets
+}
+
+# Set the elevation angle above the horizon that defines "contact", for each spacecraft
+elev_angles = [
+    degrees(for_elevation_from_half_angle(s.for_, s.satellite.model.altp * R_E))
+    for s in spacecraft_all
+]
+
+# The passes are found in worker processes, which re-import this script, so everything
+# from here on must only run in the parent process
+if __name__ == "__main__":
+    # Get all contact events for every satellite<>target pair during the horizon,
+    # with the targets shared out between processes
+    passes_per_target = find_passes_parallel(
+        [s.satellite for s in spacecraft_all],
+        [target_locations[target].location for target in Targets],
+        t0_ts, t1_ts, elev_angles)
+
+    # Initialise a list of contacts and disctionary for storing results
+    contacts = []
+    contact_per_tar={}
+
+    # for each target, run through each contact event found for it.
+    # run through each cloud fraction threshold and count the contacts that meet them.
+    for target, (sat_idx, t_rise, t_peak, t_set) in zip(Targets, passes_per_target):
+        target_location=target_locations[target]
     
-    # initialise sun for the target location
-    lat=target_location.location.latitude.degrees
-    lon=target_location.location.longitude.degrees
+        # initialise sun for the target location
+        lat=target_location.location.latitude.degrees
+        lon=target_location.location.longitude.degrees
     
-    sun= Sun(lat, lon)
+        sun= Sun(lat, lon)
 
-    Targetcontact_num={}
-    for i in prob_thresholds:
-        Targetcontact_num[i]=0
+        Targetcontact_num={}
+        for i in prob_thresholds:
+            Targetcontact_num[i]=0
     
-    # For each satellite<>location pair, get all contact events during the horizon
-    for s in spacecraft_all:
-    
-        t0_ts = load.timescale().from_datetime(start.astimezone(utc))
-        t1_ts = load.timescale().from_datetime(end.astimezone(utc))
-        
-        # Set the elevation angle above the horizon that defines "contact",
-	    # depending on whether the location is a Target or Ground Station
-        elev_angle = degrees(for_elevation_from_half_angle(
-			s.for_,s.satellite.model.altp * R_E))
-        
-        t, events = s.satellite.find_events(
-			target_location.location, t0_ts,t1_ts, altitude_degrees=elev_angle)
-        # Pre-set times
-        t_rise = start
-        t_peak= start
-        
-        for ti, event in zip(t, events):
-            # if event is 0, it is a rise event, 1 is a peak. If it's neither, instantiate
-
-            if event == 0:
-                t_rise = ti
-                continue
-            if event == 1:
-                t_peak = ti
-                continue
-            
+        for n, k in enumerate(sat_idx):
+            s = spacecraft_all[k]
             # If peak contact occurs before sunrise or after sunset, ignore it.
             # TODO clunky but only way i can get this to work for now (numpy64 error)
-            ContactTime=t_peak.utc
+            ContactTime=t_peak[n].utc
             year=int(ContactTime.year)
             month=int(ContactTime.month)
             day=int(ContactTime.day)
             hour= int(ContactTime.hour)
             minute= int(ContactTime.minute)
             second=int(ContactTime.second)
-            
+        
             ImageTime=datetime(year,month,day,hour,minute,second).astimezone(utc)
-           
+       
             sunrise=sun.get_sunrise_time(ImageTime)
             sunset=sun.get_sunset_time(ImageTime)
-            
+        
             daytime=ImageTime>sunrise and ImageTime<sunset
-            
+        
             # NOTE Remove if you only care about contacts, not daytime images.
             # if daytime==False:
             #     continue
 
             # If rise and peak are defined AND they happened in the daytime, Instantiate event
-            newContact=Contact(s, target_location, t_rise, t_peak, ti)
+            newContact=Contact(s, target_location, t_rise[n], t_peak[n], t_set[n])
 
             # NOTE Again if you only care about number of contacts, remove this part
             # now find cloud fraction during contact, if too high, skip it. Otherwise record contact
             # cf=get_cloud_fraction_from_nc_file(newContact)
             # prob_cloud_free=100-cf
-            
+        
             for pt in prob_thresholds:
-                
+            
             #     if prob_cloud_free > pt:
             #         continue
-                
+            
                 Targetcontact_num[pt]+=1
-        
+    
             contacts.append(newContact)
         
-    contact_per_tar[target]=Targetcontact_num
-
-# Print total contacts
-# print(f"Number of images with probability of being cloud free between {start_string} and {end_string}:")
-for target in contact_per_tar:
-    print(f"==> {target}")
-    prev_pt=0
-    prev_num=0
+        contact_per_tar[target]=Targetcontact_num
+
+    # Print total contacts
+    # print(f"Number of images with probability of being cloud free between {start_string} and {end_string}:")
+    for target in contact_per_tar:
+        print(f"==> {target}")
+        prev_pt=0
+        prev_num=0
     
-    for pt, num in contact_per_tar[target].items():
-     print(f"{prev_pt}-{pt}% = {num-prev_num}")
-     prev_pt=pt
-     prev_num=num
+        for pt, num in contact_per_tar[target].items():
+         print(f"{prev_pt}-{pt}% = {num-prev_num}")
+         prev_pt=pt
+         prev_num=num
      
-    print(f"Total = {num}")
-    print(f"")
+        print(f"Total = {num}")
+        print(f"")
     
-# for contact in contacts:
-#     print('UTC date and time:', contact.t_peak.utc)
+    # for contact in contacts:
+    #     print('UTC date and time:', contact.t_peak.utc)
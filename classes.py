@@ -1,9 +1,13 @@
 from math import radians
+from typing import List
 
+import numpy as np
 from skyfield.api import Time, EarthSatellite, wgs84
 
 
 class Spacecraft:
+	__slots__ = ("satellite", "for_", "aq_prob", "download_rate")
+
 	def __init__(
 			self,
 			satellite: EarthSatellite,
@@ -21,6 +25,8 @@ class Spacecraft:
 
 
 class Location:
+	__slots__ = ("name", "location")
+
 	def __init__(
 			self,
 			name: str,
@@ -32,6 +38,9 @@ class Location:
 
 class Contact:
 	"""Space-to-Ground contact base class"""
+	# Scripts can create a Contact for every pass they find, so instances are kept small
+	__slots__ = ("satellite", "target", "t_rise", "t_peak", "t_set")
+
 	def __init__(
 			self,
 			satellite: Spacecraft,
@@ -50,7 +59,55 @@ class Contact:
 	def duration(self):
 		return 24 * 60 * 60 * (self.t_set - self.t_rise)
 
-	def __lt__(self, other):				# Define what is meant when comparing one contact to another 
-		if self.t_peak.J <= other.t_peak.J:
-			return True
-		return False
+	def __lt__(self, other):				# Define what is meant when comparing one contact to another
+		# Compare the stored TT Julian dates, rather than the (derived) Julian years
+		return self.t_peak.tt < other.t_peak.tt
+
+
+class ContactArray:
+	"""
+	A set of Space-to-Ground contacts, held as one array per attribute rather than as a
+	list of Contact objects. Times are Julian dates (TT) and satellites are identified
+	by their index (sat_id) within the list of Spacecraft the contacts were found for.
+	"""
+	def __init__(
+			self,
+			sat_id: np.ndarray,
+			aq_prob: np.ndarray,
+			t_rise: np.ndarray,
+			t_peak: np.ndarray,
+			t_set: np.ndarray
+	):
+		self.sat_id = np.asarray(sat_id, dtype=np.int32)
+		self.aq_prob = np.asarray(aq_prob, dtype=float)
+		self.t_rise = np.asarray(t_rise, dtype=float)
+		self.t_peak = np.asarray(t_peak, dtype=float)
+		self.t_set = np.asarray(t_set, dtype=float)
+
+	@property
+	def duration(self):
+		return 24 * 60 * 60 * (self.t_set - self.t_rise)
+
+	def __len__(self):
+		return len(self.t_peak)
+
+	def __getitem__(self, index):
+		"""Return the contacts selected by a slice, boolean mask or array of indices"""
+		return ContactArray(
+			self.sat_id[index],
+			self.aq_prob[index],
+			self.t_rise[index],
+			self.t_peak[index],
+			self.t_set[index]
+		)
+
+	def sorted(self):
+		"""Return these contacts in order of their peak time"""
+		return self[np.argsort(self.t_peak, kind="stable")]
+
+	@classmethod
+	def concatenate(cls, contact_arrays: List["ContactArray"]):
+		return cls(*(
+			np.concatenate([getattr(c, name) for c in contact_arrays])
+			for name in ("sat_id", "aq_prob", "t_rise", "t_peak", "t_set")
+		))
@@ -1,33 +1,65 @@
-from typing import Dict
-from bisect import bisect
+from collections import namedtuple
 
 from datetime import datetime
-import csv
+from functools import lru_cache
+from typing import Tuple, Union
 
-from skyfield.api import load
+import numpy as np
+import pandas as pd
 
+from timescale import TS
 
-def get_cloud_fraction_at_time(
-		t: float,
-		clouds: Dict
-) -> float:
-	idx = bisect(list(clouds), t)
-	t0 = list(clouds)[idx]
+# Cloud cover (pct, whole percentages as uint8) samples, in time order, at Julian dates
+# (tt, float64)
+CloudSeries = namedtuple("CloudSeries", "tt pct")
 
-	if idx == len(clouds) - 1:
-		return clouds[t0]
 
-	t1 = list(clouds)[idx+1]
+def get_cloud_cover_at_time(
+		t: Union[float, np.ndarray],
+		clouds: CloudSeries
+) -> Union[int, np.ndarray]:
+	"""
+	Return the cloud cover (%) at some time(s), taken from the first sample after each
+	:param t: Julian date(s) (TT), either a single value or an array of them, in which
+		case they are all looked up by a single binary search of the samples
+	:param clouds: Cloud cover samples, in time order
+	:return:
+	"""
+	# Index of the first sample after t, held at the last sample beyond the end
+	idx = np.minimum(np.searchsorted(clouds.tt, t, side="right"), len(clouds.tt) - 1)
 
 	# TODO extrapolate between t0 & t1 to get actual cloud cover
-	return clouds[t0]
+	return clouds.pct[idx]
+
+
+@lru_cache(maxsize=64)
+def load_cloud_table(filepath: str) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Return the times (UTC, datetime64) and cloud cover (whole percentages) of every sample
+	in a cloud cover CSV file (obtained from openweathermap). Each file is only parsed
+	the first time it's asked for.
+
+	:param filepath: [str] Path of the CSV file
+	:return: Read-only arrays of the times and cloud cover, in file order
+	"""
+	# Only the time (the second column) and cloud cover columns need to be parsed
+	time_col = pd.read_csv(filepath, quotechar='|', nrows=0).columns[1]
+	city_weather = pd.read_csv(filepath, quotechar='|', usecols=[time_col, "clouds_all"])
+	times = pd.to_datetime(
+		city_weather[time_col].str[0:19], format="%Y-%m-%d %H:%M:%S").to_numpy()
+	clouds = city_weather["clouds_all"].to_numpy()
+
+	# The same arrays are handed to every caller, so mustn't be changed by any of them
+	times.flags.writeable = False
+	clouds.flags.writeable = False
+	return times, clouds
 
 
 def extract_cloud_data(
 		filepath: str,
 		start: datetime,
 		end: datetime
-) -> Dict:
+) -> CloudSeries:
 	"""
 	Import cloud cover fraction data from CSV file (obtained from openweathermap) between
 	two dates, for a particular location.
@@ -35,18 +67,15 @@ def extract_cloud_data(
 	:param filepath: [str] name of location of interest (must match the name of the csv)
 	:param start: [datetime.datetime] Time at which cloud data starts
 	:param end: [datetime.datetime] Time at which cloud data ends
-	:return: [Dict] {Julian Date: cloud fraction}
+	:return: [CloudSeries] Arrays of Julian Date & cloud cover (%), in time order
 	"""
-	cloud_info = {}
-	with open(filepath, newline='') as csvfile:
-		city_weather = csv.reader(csvfile, quotechar='|')
-		for row in city_weather:
-			if city_weather.line_num == 1:
-				cloud_idx = row.index("clouds_all")
-				continue
-			time_ = datetime.fromisoformat(row[1][0:19])
-			if time_ < start or time_ > end:
-				continue
-			time_ts = load.timescale().utc(time_.year, time_.month, time_.day, time_.hour)
-			cloud_info[time_ts.tt] = int(row[cloud_idx])/100
-	return cloud_info
+	times, clouds = load_cloud_table(filepath)
+	in_range = (times >= np.datetime64(start)) & (times <= np.datetime64(end))
+
+	# Convert whole hours since 1970, as days and hours of the day, to Julian dates
+	hours = times[in_range].astype("datetime64[h]").astype(np.int64)
+	times_ts = TS.utc(1970, 1, 1 + hours // 24, hours % 24)
+
+	# Cloud cover is given as a whole percentage, so is held exactly in a single byte,
+	# an eighth of the size of the table's times (which need double precision)
+	return CloudSeries(times_ts.tt, clouds[in_range].astype(np.uint8))
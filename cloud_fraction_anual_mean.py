@@ -1,8 +1,8 @@
 from datetime import datetime, timedelta
 from classes import Location
 from ground import find_city_location
+from Astrid import mean_cloud_fraction_in_box
 from netCDF4 import Dataset
-import numpy as np
 
 # botched together to average out a years worth of daily averaged cloud data. 
 
@@ -15,6 +15,12 @@ cf_total={}
 for t in Targets:
     cf_total[t]=0
 
+# Look up the location of every target once, rather than every day
+target_locations = {
+    target: Location(target, find_city_location(target, "lat_lon_data/coverage_lat_lng.csv"))
+    for target in Targets
+}
+
 cfmean={}
 day_count=0
 oneday=timedelta(days=1)
@@ -27,37 +33,28 @@ year=startyear
 
 while year == startyear:
 
-    for target in Targets:
-        
-        #for each target grab the lat/longs, get the cloud fraction on that day then add it to the total
-
-        target_location=Location(target, find_city_location(target, "lat_lon_data/coverage_lat_lng.csv"))
-        lat=target_location.location.latitude.degrees
-        lon=target_location.location.longitude.degrees
-
-        nc_f = f"Global_Cloud_Data_{year}/CFCdm{datestring}000040019AVPOS01GL.nc"  # Your filename
+    nc_f = f"Global_Cloud_Data_{year}/CFCdm{datestring}000040019AVPOS01GL.nc"  # Your filename
 
-        # 2018 file names are different, not sure why
-        if year=='2018':
-            nc_f = f"Global_Cloud_Data_{year}/CFCdm{datestring}000000219AVPOSE1GL.nc"  # Your filename
-
-        nc_fid = Dataset(nc_f, 'r')  # Dataset is the class behavior to open the file and create an instance of the ncCDF4 class
+    # 2018 file names are different, not sure why
+    if year=='2018':
+        nc_f = f"Global_Cloud_Data_{year}/CFCdm{datestring}000000219AVPOSE1GL.nc"  # Your filename
 
+    # Read each day's file once, then look up every target within it
+    with Dataset(nc_f, 'r') as nc_fid:  # Dataset is the class behavior to open the file and create an instance of the ncCDF4 class
         lats = nc_fid.variables['lat'][:]  # extract/copy the data
         lons = nc_fid.variables['lon'][:]
 
         cfc = nc_fid.variables['cfc_day'][:]
 
-        minlat = lat - 0.2
-        maxlat = lat + 0.2
-
-        minlon = lon - 0.2
-        maxlon = lon + 0.2
+    for target in Targets:
+        
+        #for each target grab the lat/longs, get the cloud fraction on that day then add it to the total
 
-        indlat = np.where((lats < maxlat) & (lats > minlat))
-        indlon = np.where((lons < maxlon) & (lons > minlon))
+        target_location=target_locations[target]
+        lat=target_location.location.latitude.degrees
+        lon=target_location.location.longitude.degrees
 
-        cf = np.mean(cfc[0,indlat[:],indlon[:]])
+        cf = mean_cloud_fraction_in_box(lats, lons, cfc, lat, lon)
 
         mask_check = isinstance(cf, float)
         
@@ -1,13 +1,13 @@
-from datetime import datetime
-from math import degrees
-from typing import List, Dict, Union
+from typing import List, Dict, Optional, Union
 
-from skyfield.api import load, utc
+import numpy as np
+from skyfield.api import Time
 
-from classes import Location, Contact
-from cloud import get_cloud_fraction_at_time, extract_cloud_data
-from space import for_elevation_from_half_angle
-from misc import probability_event_linear_scale
+from classes import Location, ContactArray
+from cloud import CloudSeries, get_cloud_cover_at_time, extract_cloud_data
+from space import for_elevation_from_half_angle, find_passes, find_passes_parallel, \
+	sun_elevation
+from timescale import TS
 
 # The number of downloads considered reasonable before data acquired earlier is
 # guaranteed to have been downloaded.
@@ -23,6 +23,9 @@ DOWNLOAD_PROBABILITY = {
 	4: [0.5, 0.25, 0.1, 0.05]
 }
 
+# Probabilities of using each of the downloads considered, as an array
+DOWNLOAD_WEIGHTS = np.array(DOWNLOAD_PROBABILITY[MAX_DOWNLOADS_CONSIDERED])
+
 # It is unlikely that satellites make use of EVERY download opportunity. This value
 # represents the download access frequency, i.e. download will be available every Nth
 # pass. So, a lower number here, represents a higher frequency of actually utilising
@@ -33,136 +36,190 @@ T_MIN = 1 / 24  # Time (days) since download before which 0% chance of data arri
 T_MAX = 6 / 24  # Time (days) since download after which 100% chance of data arrival
 
 
+def target_elevation_angles(sats: List) -> np.ndarray:
+	"""
+	Return, for each satellite, the elevation angle (degrees) above the horizon that
+	defines an imaging "contact" with a target
+	:param sats: List of Spacecraft objects
+	:return:
+	"""
+	R_E = 6371000.8  # Mean Earth radius
+	# FIXME using the perigee altitude here to get angle above the horizon
+	#  that results in a "contact", however this would not work if we're in
+	#  an elliptical orbit, since the elevation angle would change over time
+	for_ = np.fromiter((s.for_ for s in sats), dtype=float, count=len(sats))
+	altp = np.fromiter((s.satellite.model.altp for s in sats), dtype=float, count=len(sats))
+	return np.degrees(for_elevation_from_half_angle(for_, altp * R_E))
+
+
 def get_contact_events(
 		sats: List,
 		location: Location,
-		t0: datetime,
-		t1: datetime,
-		is_target: bool = True
-) -> List:
+		t0: Time,
+		t1: Time,
+		is_target: bool = True,
+		elev_angle: Optional[np.ndarray] = None
+) -> ContactArray:
 	"""
 	Return all contact events between a set of satellites and ground locations
 	:param sats: List of Spacecraft objects
 	:param locations: List of Location objects representing Imaging targets
 	:param stations: List of Location objects representing Ground Stations
-	:param t0_ts: Time horizon start
+	:param t0: Time horizon start
 	:param t1: Time horizon end
 	:param is_target: Boolean indicating whether or not the ground node is an image target
-	:return:
+	:param elev_angle: Target elevation angles from target_elevation_angles(sats), which
+		are worked out here if not given
+	:return: ContactArray, in which sat_id is the index of the satellite within sats
 	"""
-	R_E = 6371000.8  # Mean Earth radius
-	contacts = []
-	# For each satellite<>location pair, get all contact events during the horizon
-	for s in sats:
-		# Set the elevation angle above the horizon that defines "contact",
-		# depending on whether the location is a Target or Ground Station
-		if is_target:
-			# FIXME using the perigee altitude here to get angle above the horizon
-			#  that results in a "contact", however this would not work if we're in
-			#  an elliptical orbit, since the elevation angle would change over time
-			elev_angle = degrees(for_elevation_from_half_angle(
-				s.for_, s.satellite.model.altp * R_E))
-		else:
-			elev_angle = 10
-
-		# Get the rise, culmination and fall for all passes between this
-		# satellite:target pair during the time horizon
-		t0_ts = load.timescale().from_datetime(t0.astimezone(utc))
-		t1_ts = load.timescale().from_datetime(t1.astimezone(utc))
-		t, events = s.satellite.find_events(
-			location.location, t0_ts, t1_ts, altitude_degrees=elev_angle)
-
-		# Pre-set the
-		t_rise = t0_ts
-		t_peak = t0_ts
-		for ti, event in zip(t, events):
-			# If the event is 0 (i.e. "rise"), store the rise event, else if it's
-			# 0 (i.e. "culmination"), continue
-			if event == 0:  # If this is a Rise event, set the rise time
-				t_rise = ti
-				continue
-			if event == 1:  # if this is a Peak event, skip
-				t_peak = ti
-				continue
-			# So long as a rise time has been defined, instantiate the Download event
-			contacts.append(Contact(s, location, t_rise, t_peak, ti))
-	return contacts
+	# Set the elevation angle above the horizon that defines "contact", for each
+	# satellite, depending on whether the location is a Target or Ground Station
+	if not is_target:
+		elev_angle = 10
+	elif elev_angle is None:
+		elev_angle = target_elevation_angles(sats)
+
+	# Get the rise, culmination and fall for all passes between each
+	# satellite:location pair during the time horizon, propagating all satellites
+	# together rather than one at a time
+	sat_idx, t_rise, t_peak, t_set = find_passes(
+		[s.satellite for s in sats], location.location, t0, t1, elev_angle)
+
+	return _contact_array(sats, sat_idx, t_rise, t_peak, t_set)
+
+
+def get_contact_events_parallel(
+		sats: List,
+		locations: List[Location],
+		t0: Time,
+		t1: Time,
+		is_target: bool = True,
+		elev_angle: Optional[np.ndarray] = None,
+		max_workers: Optional[int] = None
+) -> List[ContactArray]:
+	"""
+	Return the output of get_contact_events() for each of a set of locations, with the
+	pass searches shared out between a pool of processes (see find_passes_parallel()).
+	Must be called from within an ``if __name__ == "__main__":`` block.
+	:param sats: List of Spacecraft objects
+	:param locations: List of Location objects, all targets or all ground stations
+	:param t0: Time horizon start
+	:param t1: Time horizon end
+	:param is_target: Boolean indicating whether or not the locations are image targets
+	:param elev_angle: Target elevation angles from target_elevation_angles(sats), which
+		are worked out here if not given
+	:param max_workers: Maximum number of processes (defaults to the number of CPUs)
+	:return: List, in the same order as locations, of ContactArrays
+	"""
+	if not is_target:
+		elev_angle = 10
+	elif elev_angle is None:
+		elev_angle = target_elevation_angles(sats)
+
+	passes = find_passes_parallel(
+		[s.satellite for s in sats], [loc.location for loc in locations], t0, t1,
+		elev_angle, max_workers)
+	return [_contact_array(sats, *p) for p in passes]
+
+
+def _contact_array(
+		sats: List,
+		sat_idx: np.ndarray,
+		t_rise: Time,
+		t_peak: Time,
+		t_set: Time
+) -> ContactArray:
+	"""
+	Return the passes found by find_passes() for a list of Spacecraft as a ContactArray
+	"""
+	aq_prob = np.fromiter((s.aq_prob for s in sats), dtype=float, count=len(sats))
+	return ContactArray(
+		sat_idx,
+		aq_prob[sat_idx],
+		t_rise.tt,
+		t_peak.tt,
+		t_set.tt
+	)
 
 
 def prob_arrival_via_download(
-		t: datetime,
-		download: Contact,
+		t: float,
+		t_download: Union[float, np.ndarray],
 		processing_time_min: float = T_MIN,
 		processing_time_max: float = T_MAX
-) -> float:
+) -> Union[float, np.ndarray]:
 	"""
 	Probability that data, if it had been downloaded during this "download" event,
 	would have been delivered to the customer by time "t", given some minimum and
 	maximum amount of necessary processing time (post download).
+	:param t: Julian date (TT) by which the data must have been delivered
+	:param t_download: Julian date (TT) of the end of the download event(s)
 	:return:
 	"""
-	t = load.timescale().from_datetime(t.astimezone(utc))
+	# Replace this function with a different probability function if required. It is
+	# 0 before the minimum processing time has elapsed, and 1 after the maximum, rising
+	# linearly in between. The scalar terms are combined first, leaving one subtraction
+	# and one multiplication to be applied to the download times
+	t_start = t - processing_time_min
+	rate = 1 / (processing_time_max - processing_time_min)
+	return np.clip((t_start - t_download) * rate, 0., 1.)
 
-	if t.tt <= (download.t_set + processing_time_min).tt:
-		return 0.
-
-	elif t.tt >= (download.t_set + processing_time_max).tt:
-		return 1.
 
-	# Replace this function with a different probability function if required.
-	return probability_event_linear_scale(
-		t,
-		download.t_set + processing_time_max,
-		download.t_set + processing_time_min
-	)
+def download_times_by_satellite(downloads: ContactArray) -> Dict[int, np.ndarray]:
+	"""
+	Group download events by satellite
+	:param downloads: ContactArray of Download events
+	:return: Dictionary mapping each sat_id to the (sorted) end times of its downloads
+	"""
+	order = np.lexsort((downloads.t_set, downloads.sat_id))
+	sat_id, t_set = downloads.sat_id[order], downloads.t_set[order]
+	ids, first = np.unique(sat_id, return_index=True)
+	return dict(zip(ids.tolist(), np.split(t_set, first[1:])))
 
 
 def prob_of_data_by_time(
-		image: Contact,
-		downloads: List[Contact],
-		t_arrival: datetime,
+		t_image: Union[float, np.ndarray],
+		t_downloads: np.ndarray,
+		t_arrival: float,
 		data_processing_time: Union[List[float], None] = None
-) -> float:
+) -> Union[float, np.ndarray]:
 	"""
 	Return probability that cloud-free data, from an image event, has arrived.
 
-	:param image: Image object
-	:param downloads: List of Download objects
-	:param t_arrival: Datetime object by when the processed image must have arrived
+	:param t_image: Julian date(s) (TT) at which the image(s) were taken
+	:param t_downloads: Sorted end times (TT) of the downloads made by the satellite
+		that took the image(s)
+	:param t_arrival: Julian date (TT) by when the processed image must have arrived
 	:param data_processing_time: List of length 2, containing the minimum and maximum
 		processing times
-	:return: Probability of arrival
+	:return: Probability of arrival, for each image
 	"""
 	if not data_processing_time:
 		data_processing_time = [T_MIN, T_MAX]
 
-	downloads_ = [
-		d for d in downloads
-		if d.t_set.tt > image.t_peak.tt and d.satellite == image.satellite
-	]
+	# Downloads that end after the image is taken
+	start = np.searchsorted(t_downloads, t_image, side="right")
 
 	# Extracting only every 8th download opportunity, to simulate something closer to
 	# the real download contact schedule seen by Planet's FLOCK
 	# TODO Make this platform specific, currently hard coded for all
-	downloads_trimmed = downloads_[::DOWNLOAD_FREQ]
-
-	# Initiate a variable that tracks the probability that data that WAS delivered would
-	# have arrived by this time. This does NOT consider the probability of it actually
-	# existing in the first place. E.g. if we're passed the max processing time for two
-	# download events, and we're only considering two download events feasible,
-	# then this would be 100%
-	total_prob_arr_via_download = 0
-	for k in range(min(MAX_DOWNLOADS_CONSIDERED, len(downloads_trimmed))):
-
-		prob_arrival_via_d = prob_arrival_via_download(
-			t_arrival,
-			downloads_trimmed[k],
-			data_processing_time[0],
-			data_processing_time[1]
-		)
-
-		total_prob_arr_via_download += \
-			DOWNLOAD_PROBABILITY[MAX_DOWNLOADS_CONSIDERED][k] * prob_arrival_via_d
+	idx = start[..., None] + DOWNLOAD_FREQ * np.arange(MAX_DOWNLOADS_CONSIDERED)
+	exists = idx < len(t_downloads)
+	downloads_trimmed = np.append(t_downloads, t_arrival)[
+		np.minimum(idx, len(t_downloads))]
+
+	# The probability that data that WAS delivered would have arrived by this time, via
+	# each of the download events considered. This does NOT consider the probability of
+	# it actually existing in the first place. E.g. if we're passed the max processing
+	# time for two download events, and we're only considering two download events
+	# feasible, then the total would be 100%
+	prob_arrival_via_d = np.where(exists, prob_arrival_via_download(
+		t_arrival,
+		downloads_trimmed,
+		data_processing_time[0],
+		data_processing_time[1]
+	), 0.)
+	total_prob_arr_via_download = prob_arrival_via_d @ DOWNLOAD_WEIGHTS
 
 	# Combine the probability of the image existing and the probability of it having
 	# arrived IF it were downloaded, to get the overall probability of
@@ -170,30 +227,56 @@ def prob_of_data_by_time(
 
 
 def probability_no_image_from_set(
-		images: List[Contact],
-		downloads: List[Contact],
-		day0: datetime,
-		cloud_data: Dict[float, float],
+		images: ContactArray,
+		target: Location,
+		downloads: Dict[int, np.ndarray],
+		day0: Time,
+		cloud_data: CloudSeries,
 		cloud_threshold: float = 1.0
 ) -> float:
-	"""Get the probability that NO image will have been received of a particular location"""
-	cumulative_probability_of_no_image = 1.
-	for image in images:
-		# If the image is not captured during sunlight, skip
-		if 18 < image.t_peak.gast < 6:
-			continue
+	"""
+	Get the probability that NO image will have been received of a particular location
+	:param images: ContactArray of Image events over the location
+	:param target: The location
+	:param downloads: Sorted end times of each satellite's downloads, as returned by
+		download_times_by_satellite()
+	:param day0: Time by which the processed image must have arrived
+	:param cloud_data: Cloud cover over the location
+	:param cloud_threshold: Maximum fraction of cloud cover of a useful image
+	:return:
+	"""
+	# Images deemed "too cloudy", or not captured during sunlight, are of no use, so
+	# are dropped before any probabilities are worked out. The cloud cover is found
+	# first, in one pass over the cloud data, as it's the cheaper test. It's in whole
+	# percentages, so the threshold is converted to a percentage too, rounded so that
+	# e.g. 0.29 is taken as 29% rather than 28.999...%
+	cloud = get_cloud_cover_at_time(images.t_peak, cloud_data)
+	useful = cloud <= round(cloud_threshold * 100, 6)
+	images, cloud = images[useful], cloud[useful]
 
-		# If the image is deemed "too cloudy", skip
-		cloud = get_cloud_fraction_at_time(image.t_peak.tt, cloud_data)
-		if cloud > cloud_threshold:
-			continue
+	# Whether the target is in sunlight at the time of every remaining image
+	daylight = sun_elevation(TS.tt_jd(images.t_peak), target.location) > 0
+	images, cloud = images[daylight], cloud[daylight]
+	if not len(images):
+		return 1.
 
-		p_image_is_cloud_free = (1. - cloud) * image.satellite.aq_prob
+	# Time by which the data must have arrived, which is the same for every image
+	t_day0 = day0.tt
 
-		p_image_delivered = prob_of_data_by_time(image, downloads, day0)
+	# Probability that each image would have been delivered, found for all the images
+	# taken by a satellite at once, against that satellite's downloads. Images from
+	# satellites that make no downloads are never delivered
+	p_delivered = np.zeros(len(images))
+	for sat_id, t_downloads in downloads.items():
+		by_sat = images.sat_id == sat_id
+		p_delivered[by_sat] = prob_of_data_by_time(
+			images.t_peak[by_sat], t_downloads, t_day0)
 
-		p_image_delivered_and_cloud_free = p_image_delivered * p_image_is_cloud_free
+	# Probability that each image is delivered and cloud free
+	p_image_is_cloud_free = (1 - cloud / 100.0) * images.aq_prob
+	p_image_delivered_and_cloud_free = p_delivered * p_image_is_cloud_free
 
-		# Update probability that we'd have received NO image by this time
-		cumulative_probability_of_no_image *= 1 - p_image_delivered_and_cloud_free
-	return cumulative_probability_of_no_image
+	# Probability that we'd have received NO image by the time of each image, multiplied
+	# up in time order
+	cumulative_probability_of_no_image = np.cumprod(1 - p_image_delivered_and_cloud_free)
+	return float(cumulative_probability_of_no_image[-1])
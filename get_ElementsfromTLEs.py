@@ -1,10 +1,9 @@
-import os
 import csv
 
 from datetime import datetime
-from skyfield.api import load
-from math import degrees
-from space import  fetch_tle_and_write_to_txt
+import numpy as np
+from sgp4.api import Satrec
+from space import  get_tle_file
 
 
 # NOTE: A lot of the code is patched together from chris's scripts and adapted. Also adapted some code from Astrid.
@@ -29,35 +28,31 @@ R_E = 6371000.8  # Mean Earth radius
 time_start = str(start)[0:10]
 time_end = str(end)[0:10]
 
-file_tle = f"tle_data//{platform}_tle_{time_start}_{time_end}.txt"
-if not os.path.isfile(file_tle):  # If TLE file doesn't already exist, create it.
-	file_norad = f"norad_ids//{platform}_ids.txt"
-	fetch_tle_and_write_to_txt(file_tle, file_norad, time_start, time_end)
+file_tle = get_tle_file(platform, time_start, time_end)  # Fetched if it doesn't already exist
 
+# Only the orbital elements are needed, so parse the TLEs straight into SGP4 models (skipping
+# the name lines), rather than building Skyfield satellites with their epoch Times
 satellites={}
-for s in load.tle_file(file_tle):
-      satellites[s.model.satnum]=s
-
-a_data = []
-e_data = []
-i_data = []
-raan_data = []
-u0_data = []
-elements = []
-
-# Loop through each satellite in the TLE file
-for satnum, satellite in satellites.items():
-	a = 6378.135*1000* satellite.model.a
-	e = 0
-	i = degrees(satellite.model.inclo)
-	raan = degrees(satellite.model.nodeo)
-	u0 = degrees(satellite.model.mo)
-	elements.append([satnum, a, e, i, raan, u0])
- 
+with open(file_tle) as tle_lines:
+    lines = tle_lines.read().splitlines()
+for line1, line2 in zip(lines, lines[1:]):
+    if line1.startswith("1 ") and line2.startswith("2 "):
+        model = Satrec.twoline2rv(line1, line2)
+        satellites[model.satnum]=model
+
+# Gather the elements of every satellite into arrays, converting the angles to degrees in one go
+models = list(satellites.values())
+n = len(models)
+a = 6378.135*1000*np.fromiter((m.a for m in models), dtype=float, count=n)
+e = np.zeros(n, dtype=int)
+i = np.degrees(np.fromiter((m.inclo for m in models), dtype=float, count=n))
+raan = np.degrees(np.fromiter((m.nodeo for m in models), dtype=float, count=n))
+u0 = np.degrees(np.fromiter((m.mo for m in models), dtype=float, count=n))
+
 output_csv = 'satellite_elements.csv'
 with open(output_csv, mode='w', newline='') as file:
     writer = csv.writer(file)
     writer.writerow(['Satellite Number','Semi-major axis(m)','eccentricity','inclination(degrees)', 'RAAN (degrees)','Argument of latitude(degrees)'])  # Header
-    writer.writerows(elements)  # Write data
+    writer.writerows(zip(satellites, a.tolist(), e.tolist(), i.tolist(), raan.tolist(), u0.tolist()))  # Write data
 
 print(f"Orbital Elements data saved to {output_csv}")
\ No newline at end of file
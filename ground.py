@@ -1,4 +1,33 @@
-import csv
+from functools import lru_cache
+from typing import Dict
+
+import pandas as pd
+
+
+@lru_cache(maxsize=None)
+def load_city_table(
+		filepath: str = "lat_lon_data/worldcities.csv"
+) -> Dict[str, tuple]:
+	"""
+	Return the (lat, lon) of every city in a locations file, keyed by city name. The file
+	is only read once per path.
+
+	:param filepath: String of the path where the locations file is located
+	:return:
+	"""
+	cities = pd.read_csv(
+		filepath,
+		usecols=["city_ascii", "lat", "lng"],
+		quotechar='|',
+		dtype={"city_ascii": str},
+		keep_default_na=False  # Otherwise cities such as "Nan" are read as missing
+	)
+	# Where a name appears more than once, keep the first (as the file is ordered)
+	cities = cities.drop_duplicates("city_ascii")
+	return dict(zip(
+		cities["city_ascii"],
+		zip(cities["lat"].astype(float), cities["lng"].astype(float))
+	))
 
 
 def find_city_location(
@@ -13,16 +42,7 @@ def find_city_location(
 	:param filepath: String of the path where the locations file is located
 	:return:
 	"""
-
-	with open(filepath, newline='') as csvfile:
-		locations = csv.reader(csvfile, quotechar='|')
-		for k, row in enumerate(locations):
-			if k == 0:												# If this is the first row, find the indices that indicate the city name, lat and long
-				col_name = row.index("city_ascii")
-				col_lat = row.index("lat")
-				col_lon = row.index("lng")
-				continue
-			if row[col_name] == city_name:							# If we found the correct city, return the lat and long values
-				return float(row[col_lat]), float(row[col_lon])
-
-	raise ValueError(f"City {city_name} not found in the file")
+	try:
+		return load_city_table(filepath)[city_name]
+	except KeyError:
+		raise ValueError(f"City {city_name} not found in the file") from None
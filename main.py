@@ -6,11 +6,15 @@ given cloud coverage data and satellite position data
 from datetime import datetime, timedelta
 from typing import List, Dict, Union
 
-from classes import Location
+from skyfield.api import utc
+
+from classes import Location, ContactArray
 from space import get_spacecraft_from_epoch
-from data_movement import get_contact_events, probability_no_image_from_set
+from data_movement import get_contact_events_parallel, download_times_by_satellite, \
+	probability_no_image_from_set, target_elevation_angles
 from ground import find_city_location
 from cloud import extract_cloud_data
+from timescale import TS
 
 
 def main(
@@ -31,6 +35,9 @@ def main(
 	:param platform: [str] Mapping to the satellite platforms of interest
 	:param cloud_threshold: [float] Maximum fraction of cloud cover before an image is
 		considered to be of zero value and, therefore, not included in analysis
+
+	The contact searches are run in worker processes, so scripts must
+	call this from within an ``if __name__ == "__main__":`` block.
 	"""
 	# Define the date and time from which we want to extract TLE data. This should be
 	# early enough such that we can be sure not to miss the epoch (i.e. earliest time
@@ -42,26 +49,36 @@ def main(
 	# to, but later than, the epoch time specified.
 	satellites = get_spacecraft_from_epoch(platform, t_epoch, t_v0, t_final)
 
-	downloads = []
-	for gs in ground_stations:
-		downloads.extend(
-			get_contact_events(satellites, gs, t_v0, t_final, False)
-		)
-	downloads = sorted(downloads)
+	# The horizon as Skyfield Times, converted once and shared by every contact search
+	t_v0_ts = TS.from_datetime(t_v0.astimezone(utc))
+	t_final_ts = TS.from_datetime(t_final.astimezone(utc))
+
+	# Download opportunities with every ground station, grouped by satellite once here
+	# rather than for every target. As with the targets below, the searches are shared
+	# out between processes, by ground station and (with fewer stations than processes)
+	# by satellite
+	downloads = download_times_by_satellite(ContactArray.concatenate(
+		get_contact_events_parallel(satellites, ground_stations, t_v0_ts, t_final_ts, False)))
+
+	# The elevation angles defining a contact with a target depend only on the satellite
+	elev_angles = target_elevation_angles(satellites)
+
+	# Get all the potential contact opportunities with every target. These might not
+	# necessarily be realised, because of things like cloud cover and/or time of day,
+	# but these are events in which the satellite is above the minimum elevation for
+	# the target. The targets are independent of one another, so are searched for in a
+	# pool of processes
+	target_locations = [Location(target, find_city_location(target)) for target in targets]
+	images_by_target = get_contact_events_parallel(
+		satellites, target_locations, t_v0_ts, t_final_ts, elev_angle=elev_angles)
 
 	probabilities = {}
-	for target in targets:
+	for target, city_location, images in zip(targets, target_locations, images_by_target):
 		# Given a particular City, and a particular "Day 0", get the probability that a
 		# decision maker will have received useful (processed) data, with which a trading
 		# decision can be made. There should be a probability associated with images
 		# acquired during preceding days, rather than simply Day 0 imagery.
-		city_location = Location(target, find_city_location(target))
-		# Get all the potential contact opportunities. These might not necessarily be
-		# realised, because of things like cloud cover and/or time of day, but these are
-		# events in which the satellite is above the minimum elevation for the target
-		images = sorted(
-			get_contact_events(satellites, city_location, t_v0, t_final)
-		)
+		images = images.sorted()
 
 		# Get cloud data for the city of interest during our time horizon
 		# TODO this should be handled using logic, rather than simply a try-except clause
@@ -75,8 +92,9 @@ def main(
 		# find the probability that NO image is received by Day 0
 		no_image = probability_no_image_from_set(
 			images,
+			city_location,
 			downloads,
-			t_final,
+			t_final_ts,
 			cloud_data,
 			cloud_threshold,
 		)
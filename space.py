@@ -1,12 +1,22 @@
 import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from math import acos, sin, pi, radians, sqrt, cos, asin
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Tuple
 from numpy import sign
 from datetime import datetime
 
-from skyfield.api import load, utc, Timescale, EarthSatellite
+import numpy as np
+from sgp4.api import Satrec, SatrecArray
+from sgp4.exporter import export_tle
+from skyfield.api import load, utc, wgs84, Timescale, Time, EarthSatellite
+from skyfield.constants import DAY_S, T0
+from skyfield.sgp4lib import theta_GMST1982
+from skyfield.toposlib import GeographicPosition
 
 from classes import Spacecraft
+from timescale import TS
 from space_track_api_script import space_track_api_request
 
 PLATFORM_ATTRIBS = {
@@ -22,6 +32,31 @@ PLATFORM_ATTRIBS = {
 	}
 }
 
+# Number of grid points propagated per SatrecArray call when searching for passes
+SGP4_BLOCK = 4096
+
+# Maximum number of positions (satellite & grid point pairs, of 24 bytes each) kept in
+# memory, so that the same satellites needn't be propagated again when searching over
+# another location
+POSITION_CACHE_SIZE = 2 ** 20
+_position_cache = OrderedDict()
+
+
+def get_platform_type(
+		satellite_name: str,
+		platform_attribs: Dict = PLATFORM_ATTRIBS
+) -> str:
+	"""
+	Return the platform type (i.e. the key within the platform attributes) of a satellite
+	:param satellite_name: Name of the satellite, which contains the platform type
+	:param platform_attribs: Dictionary of attributes of each platform type
+	:return:
+	"""
+	for platform_type in platform_attribs["for"]:
+		if platform_type in satellite_name:
+			return platform_type
+	raise ValueError(f"No platform attributes defined for satellite {satellite_name}")
+
 
 # TODO Not currently used, but was added in as a way to perhaps better dictate which
 #  ground station passes to consider as "usable" for each platform.
@@ -77,24 +112,473 @@ def ppd(sma, inc, el, lat):
 
 
 def for_elevation_from_half_angle(
-		half_angle: Union[int, float],
-		altitude: Union[int, float],
-) -> float:
+		half_angle: Union[int, float, np.ndarray],
+		altitude: Union[int, float, np.ndarray],
+) -> Union[float, np.ndarray]:
 	"""
-	Return the elevation above the horizon at the edge of the Field of Regard
+	Return the elevation above the horizon at the edge of the Field of Regard. Takes
+	either single values, or arrays (e.g. one value per satellite) which are broadcast
+	together.
 	:param half_angle: FoR half-angle (i.e. the angle, from Nadir, to edge of view) (rad)
 	:param altitude: Satellite altitude (m)
 	:return:
 	"""
 	R_E = 6371000.8  # Mean Earth radius
 
-	# Check that we don't have the entire Earth in view, if so, return 90 deg
-	lamda_0 = acos(R_E / (R_E + altitude))
-	rho = (pi / 2) - lamda_0
-	if half_angle >= rho:
-		return 0.0
+	# sin(rho) = cos(lamda_0) = R_E / (R_E + altitude), where lamda_0 is the Earth central
+	# angle to the horizon. If the half-angle is at least rho, the entire Earth disc is in
+	# view and the elevation is 0, which is where the cosine below reaches 1
+	cos_elevation = np.sin(half_angle) * (R_E + np.asarray(altitude)) / R_E
+	return np.arccos(np.minimum(cos_elevation, 1.0))
 
-	return acos(sin(half_angle) / sin(rho))
+
+def max_visible_latitude(
+		satellites: List[EarthSatellite],
+		altitude_degrees: Union[float, np.ndarray] = 0.0
+) -> np.ndarray:
+	"""
+	Return the highest latitude (degrees) from which each satellite can ever be seen
+	above some elevation, i.e. the latitude reached by its ground track plus the
+	Earth central angle to the edge of its visibility footprint at apogee.
+	:param satellites: List of EarthSatellite objects
+	:param altitude_degrees: Minimum elevation, either a single value or one per
+		satellite (degrees)
+	:return:
+	"""
+	models = [s.model for s in satellites]
+	inc = np.array([m.inclo for m in models])
+	lamda = _footprint_half_angle(models, altitude_degrees)
+	return np.degrees(np.minimum(inc, pi - inc) + lamda)
+
+
+def _footprint_half_angle(
+		models: List[Satrec],
+		altitude_degrees: Union[float, np.ndarray] = 0.0
+) -> np.ndarray:
+	"""
+	Return the Earth central angle (rad) from the sub-satellite point to the edge of the
+	area from which each satellite (given by its SGP4 model) is seen above some elevation,
+	at apogee (where it's largest), plus a margin.
+	"""
+	margin = radians(1.0)  # Allowance for Earth oblateness and orbital perturbations
+	r_e = np.array([m.radiusearthkm for m in models])
+	r_apo = (1 + np.array([m.alta for m in models])) * r_e
+	el = np.radians(altitude_degrees)
+	return pi / 2 - el - np.arcsin(r_e * np.cos(el) / r_apo) + margin
+
+
+def sun_elevation(
+		t: Time,
+		location: GeographicPosition
+) -> np.ndarray:
+	"""
+	Return the elevation (degrees) of the Sun above a ground location.
+
+	Uses the low precision solar coordinates of the Astronomical Almanac (accurate to
+	~0.01 deg between 1950 & 2050), which is ample for telling day from night, and means
+	no planetary ephemeris needs to be downloaded.
+
+	:param t: Time(s) at which the elevation is found
+	:param location: Ground location from which the elevation is measured
+	:return:
+	"""
+	n = t.tt - T0  # Days since J2000
+	mean_lon = np.radians(280.460 + 0.9856474 * n)
+	mean_anomaly = np.radians(357.528 + 0.9856003 * n)
+	ecl_lon = mean_lon + np.radians(
+		1.915 * np.sin(mean_anomaly) + 0.020 * np.sin(2 * mean_anomaly))
+	obliquity = np.radians(23.439 - 0.0000004 * n)
+
+	# Equatorial coordinates of the Sun, and its hour angle at the location. The mean
+	# sidereal time needs no nutation model, and is within ~1s of the apparent one
+	right_ascension = np.arctan2(np.cos(obliquity) * np.sin(ecl_lon), np.cos(ecl_lon))
+	declination = np.arcsin(np.sin(obliquity) * np.sin(ecl_lon))
+	hour_angle = t.gmst * (pi / 12) + location.longitude.radians - right_ascension
+
+	lat = location.latitude.radians
+	return np.degrees(np.arcsin(
+		sin(lat) * np.sin(declination)
+		+ cos(lat) * np.cos(declination) * np.cos(hour_angle)))
+
+
+def _itrf_from_teme(
+		r_teme: np.ndarray,
+		t: Time
+) -> np.ndarray:
+	"""
+	Return satellite positions rotated from the TEME frame into the Earth-fixed frame
+	:param r_teme: TEME positions (km), with the xyz components on the last axis
+	:param t: Time array matching the second-to-last axis of r_teme
+	:return:
+	"""
+	# Rotate using the Greenwich Mean Sidereal Time, which is the same simplification
+	# Skyfield makes within find_events()
+	theta, _ = theta_GMST1982(t.whole, t.ut1_fraction)
+	cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+	r_itrf = np.empty(np.shape(r_teme))
+	r_itrf[..., 0] = cos_theta * r_teme[..., 0] + sin_theta * r_teme[..., 1]
+	r_itrf[..., 1] = cos_theta * r_teme[..., 1] - sin_theta * r_teme[..., 0]
+	r_itrf[..., 2] = r_teme[..., 2]
+	return r_itrf
+
+
+def _location_frame(
+		location: GeographicPosition
+) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Return the Earth-fixed position (km) of a ground location, and the unit vector
+	pointing "up" (normal to the WGS84 ellipsoid) there
+	"""
+	lat, lon = location.latitude.radians, location.longitude.radians
+	up = np.array([cos(lat) * cos(lon), cos(lat) * sin(lon), sin(lat)])
+	return location.itrs_xyz.km, up
+
+
+def _elevation_from_itrf(
+		r_itrf: np.ndarray,
+		origin: np.ndarray,
+		up: np.ndarray
+) -> np.ndarray:
+	"""
+	Return the elevation (degrees) of satellite positions above a ground location
+	:param r_itrf: Earth-fixed positions (km), with the xyz components on the last axis
+	:param origin: Earth-fixed position of the ground location (km)
+	:param up: Unit vector normal to the ellipsoid at the ground location
+	:return:
+	"""
+	# Vector from the ground location to the satellite, projected onto local "up"
+	d = r_itrf - origin
+	return np.degrees(np.arcsin((d @ up) / np.sqrt(np.einsum("...i,...i", d, d))))
+
+
+def _itrf_positions(
+		models: List[Satrec],
+		t: Time
+) -> np.ndarray:
+	"""
+	Return the Earth-fixed positions (km) of satellites (given by their SGP4 models) on a
+	grid of times (n_sats x n_times x 3).
+	Positions are cached per satellite (and TLE) and grid, and only the satellites that
+	aren't already cached are propagated. As they're cached after rotation into the
+	Earth-fixed frame, any other location only needs its own elevations working out.
+	"""
+	t_key = (t.tt[0], t.tt[-1], len(t)) if len(t) else None
+	keys = [
+		(m.satnum, m.jdsatepoch, m.jdsatepochF, t_key)
+		for m in models
+	]
+	missing = [k for k, key in enumerate(keys) if key not in _position_cache]
+	if missing:
+		fr = t.ut1_fraction - t.dut1 / DAY_S  # SGP4 expects a UTC Julian date
+		_, r, _ = SatrecArray([models[k] for k in missing]).sgp4(t.whole, fr)
+		for k, r_k in zip(missing, _itrf_from_teme(r, t)):
+			_position_cache[keys[k]] = r_k
+	for key in keys:
+		_position_cache.move_to_end(key)
+	r = np.stack([_position_cache[key] for key in keys]) if keys \
+		else np.empty((0, len(t), 3))
+
+	# Drop the least recently used positions once there are too many (taking each to
+	# span a grid like this one), which may include some of these if there are a lot
+	# of satellites
+	while _position_cache and len(_position_cache) * len(t) > POSITION_CACHE_SIZE:
+		_position_cache.popitem(last=False)
+	return r
+
+
+def _itrf_at(
+		models: List[Satrec],
+		sat_idx: np.ndarray,
+		t: Time
+) -> np.ndarray:
+	"""
+	Return the Earth-fixed position (km) of the satellite with SGP4 model
+	models[sat_idx[k]] at time t[k], for all k
+	"""
+	fr = t.ut1_fraction - t.dut1 / DAY_S  # SGP4 expects a UTC Julian date
+	r = np.full((len(sat_idx), 3), np.nan)
+	for k in np.unique(sat_idx):
+		in_k = sat_idx == k
+		_, r[in_k], _ = models[k].sgp4_array(t.whole[in_k], fr[in_k])
+	return _itrf_from_teme(r, t)
+
+
+def _elevation_at(
+		models: List[Satrec],
+		sat_idx: np.ndarray,
+		t: Time,
+		origin: np.ndarray,
+		up: np.ndarray
+) -> np.ndarray:
+	"""
+	Return the elevation (degrees) of the satellite with SGP4 model models[sat_idx[k]] at
+	time t[k], for all k, above the ground location at origin
+	"""
+	return _elevation_from_itrf(_itrf_at(models, sat_idx, t), origin, up)
+
+
+def find_passes(
+		satellites: List[EarthSatellite],
+		location: GeographicPosition,
+		t0: Time,
+		t1: Time,
+		altitude_degrees: Union[float, np.ndarray] = 0.0,
+		step_days: float = 1 / 1440
+) -> Tuple[np.ndarray, Time, Time, Time]:
+	"""
+	Return the rise, peak and set times of all passes of a set of satellites over a
+	ground location, during which they exceed some elevation above the horizon.
+
+	All satellites are propagated together (via an SGP4 SatrecArray) on a regular time
+	grid. Local maxima in elevation are then refined with a golden-section search,
+	and the rise & set times by bisection, to within half a second.
+
+	:param satellites: List of EarthSatellite objects
+	:param location: Ground location over which passes are found
+	:param t0: Time horizon start
+	:param t1: Time horizon end
+	:param altitude_degrees: Minimum elevation of a pass, either a single value or
+		one per satellite (degrees)
+	:param step_days: Spacing of the coarse time grid (days)
+	:return: Index (into satellites) of the satellite making each pass, followed by
+		Time arrays of the rise, peak and set of each pass
+	"""
+	ts = t0.ts
+	tol = 0.5 / DAY_S
+	altitude_degrees = np.broadcast_to(
+		np.asarray(altitude_degrees, dtype=float), (len(satellites),))
+
+	# Satellites that can never be seen from the location's latitude will not pass
+	# over it, so there's no need to propagate them
+	reachable = np.flatnonzero(
+		max_visible_latitude(satellites, altitude_degrees)
+		>= abs(location.latitude.degrees))
+	models = [satellites[k].model for k in reachable]
+	altitude_degrees = altitude_degrees[reachable]
+
+	# The location's position & local vertical are used for every elevation found
+	# below, so are worked out just the once
+	origin, up = _location_frame(location)
+
+	# The elevation of every satellite is computed a block of grid points at a time, so
+	# that memory use doesn't grow with the length of the horizon. The grid ends at t1
+	# itself, so that passes setting within the last step are found
+	t = ts.tt_jd(np.append(np.arange(t0.tt, t1.tt, step_days), t1.tt))
+	n_times = len(t)
+	thr = altitude_degrees[:, None]
+
+	# Local maxima of the sampled elevation bracket each culmination, and runs of grid
+	# points at or above the minimum elevation bracket each rise and set. Both are found
+	# from each block together with the last two samples of the block before. The grid
+	# is padded either side, so that a satellite already descending at t0 (or still
+	# rising at t1) has a maximum at the end of the grid too, and every run has an end
+	prev = np.full((len(models), 1), -np.inf)
+	prev_start = -1  # Grid index of the first column of prev
+	maxima, run_starts, run_ends = [], [], []
+	for b in range(0, n_times, SGP4_BLOCK):
+		r = _itrf_positions(models, t[b:b + SGP4_BLOCK])
+		ext = [prev, _elevation_from_itrf(r, origin, up)]
+		if b + SGP4_BLOCK >= n_times:
+			ext.append(np.full((len(models), 1), -np.inf))
+		ext = np.hstack(ext)
+		del r
+
+		mid = ext[:, 1:-1]
+		sat, q = np.nonzero((mid >= ext[:, :-2]) & (mid > ext[:, 2:]))
+		maxima.append((sat, prev_start + 1 + q))
+
+		# Runs start (or end) wherever a sample is above (or below) the minimum
+		# elevation and the one before it isn't. The two samples carried over from the
+		# last block were compared then, so aren't again
+		above = ext >= thr
+		n_prev = prev.shape[1]
+		after, before = above[:, n_prev:], above[:, n_prev - 1:-1]
+		sat, q = np.nonzero(after & ~before)
+		run_starts.append((sat, prev_start + n_prev + q))
+		sat, q = np.nonzero(before & ~after)
+		run_ends.append((sat, prev_start + n_prev + q))
+
+		prev, prev_start = ext[:, -2:], prev_start + ext.shape[1] - 2
+
+	def gather(found):
+		# Combine the (satellite, grid index) pairs found in each block, ordered by
+		# satellite and then by time
+		sat, idx = (np.concatenate(x) for x in zip(*found))
+		order = np.lexsort((idx, sat))
+		return sat[order], idx[order]
+
+	sat_idx, i = gather(maxima)
+	run_sat, run_start = gather(run_starts)
+	_, run_end = gather(run_ends)
+
+	# Most culminations are on the far side of the Earth. Only those whose sub-satellite
+	# point comes within the visibility footprint can reach the minimum elevation, and
+	# between grid points the sub-satellite point moves by at most the satellite's
+	# angular rate (at perigee) plus the Earth's rotation, times the grid spacing. Any
+	# that can't are dropped now, rather than being refined
+	r_i = _itrf_at(models, sat_idx, t[i])
+	cos_lamda = (r_i @ origin) / (np.linalg.norm(r_i, axis=1) * np.linalg.norm(origin))
+	ecc = np.array([m.ecco for m in models])
+	rate = np.array([m.no_kozai for m in models]) * 1440 * (1 + ecc) ** 2 \
+		/ (1 - ecc ** 2) ** 1.5 + 2 * pi * 1.0027379
+	reach = _footprint_half_angle(models, altitude_degrees) + rate * step_days
+	keep = np.arccos(np.clip(cos_lamda, -1, 1)) <= reach[sat_idx]
+	sat_idx, i = sat_idx[keep], i[keep]
+
+	def f(tt):
+		return _elevation_at(models, sat_idx, ts.tt_jd(tt), origin, up)
+
+	# Golden-section search for the time of peak elevation within [t_i-1, t_i+1], or
+	# within the one step beside it at either end of the grid
+	inv_phi = (sqrt(5) - 1) / 2
+	a, b = t.tt[np.maximum(i - 1, 0)], t.tt[np.minimum(i + 1, len(t) - 1)]
+	c, d = b - inv_phi * (b - a), a + inv_phi * (b - a)
+	fc, fd = f(c), f(d)
+	for _ in range(int(np.ceil(np.log(tol / (2 * step_days)) / np.log(inv_phi)))):
+		left = fc > fd  # Peak lies in [a, d], else in [c, b]
+		a, b = np.where(left, a, c), np.where(left, d, b)
+		x = np.where(left, b - inv_phi * (b - a), a + inv_phi * (b - a))
+		fx = f(x)
+		c, fc, d, fd = (
+			np.where(left, x, d), np.where(left, fx, fd),
+			np.where(left, c, x), np.where(left, fc, fx))
+	t_peak = (a + b) / 2
+
+	# A satellite that's highest at t0 itself was already descending, and (as with
+	# Skyfield's find_events) its peak is taken to be t0
+	first = np.flatnonzero(i == 0)
+	at_t0 = np.full(len(first), t0.tt)
+	descending = _elevation_at(models, sat_idx[first], ts.tt_jd(at_t0), origin, up) \
+		>= _elevation_at(models, sat_idx[first], ts.tt_jd(t_peak[first]), origin, up)
+	t_peak[first[descending]] = t0.tt
+
+	# Discard any culminations that don't reach the minimum elevation
+	keep = f(t_peak) >= altitude_degrees[sat_idx]
+	sat_idx, i, t_peak = sat_idx[keep], i[keep], t_peak[keep]
+
+	# For each peak, find the last grid point before, and the first grid point after,
+	# at which the satellite was below the minimum elevation. These lie either side of
+	# the run of grid points (if any) that the peak falls within, which is found by a
+	# binary search of the runs, with a sentinel first so that every search lands on one
+	run_sat, run_start, run_end = (
+		np.concatenate(([-1], x)) for x in (run_sat, run_start, run_end))
+	run_key = run_sat * (n_times + 1) + run_start
+
+	def run_containing(idx):
+		r = np.searchsorted(run_key, sat_idx * (n_times + 1) + idx, side="right") - 1
+		return (run_sat[r] == sat_idx) & (idx < run_end[r]), r
+
+	m = np.where(t_peak < t.tt[i], i - 1, i)
+	in_run, r = run_containing(m)
+	j = np.where(in_run, run_start[r] - 1, m)
+	in_run, r = run_containing(m + 1)
+	k = np.where(in_run, run_end[r], m + 1)
+
+	# Passes that haven't set by the end of the horizon are ignored, while those that
+	# had already risen at the start of the horizon are said to rise at t0
+	keep = k < n_times
+	sat_idx, t_peak, j, k = sat_idx[keep], t_peak[keep], j[keep], k[keep]
+	risen = j < 0
+	j[risen] = 0
+
+	# If a satellite culminates more than once without setting, keep only one pass,
+	# with the latest peak
+	last = np.ones(len(k), dtype=bool)
+	last[:-1] = (sat_idx[:-1] != sat_idx[1:]) | (k[:-1] != k[1:])
+	sat_idx, t_peak, j, k, risen = \
+		sat_idx[last], t_peak[last], j[last], k[last], risen[last]
+
+	def crossing(t_in, t_out):
+		# Bisect between a time above, and a time below, the minimum elevation
+		width = np.max(np.abs(t_in - t_out), initial=tol)
+		for _ in range(int(np.ceil(np.log2(width / tol)))):
+			mid = (t_in + t_out) / 2
+			inside = f(mid) >= altitude_degrees[sat_idx]
+			t_in, t_out = np.where(inside, mid, t_in), np.where(inside, t_out, mid)
+		return (t_in + t_out) / 2
+
+	t_rise = np.where(risen, t0.tt, crossing(t_peak, t.tt[j]))
+	t_set = crossing(t_peak, t.tt[k])
+	return reachable[sat_idx], ts.tt_jd(t_rise), ts.tt_jd(t_peak), ts.tt_jd(t_set)
+
+
+def _find_passes_from_tles(
+		tles: List[Tuple[str, str, str]],
+		lat_lon: Tuple[float, float],
+		t0_tt: float,
+		t1_tt: float,
+		altitude_degrees: Union[float, np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+	"""
+	Worker for find_passes_parallel(), taking (and returning) only picklable values
+	"""
+	satellites = [EarthSatellite(line1, line2, name, TS) for name, line1, line2 in tles]
+	sat_idx, t_rise, t_peak, t_set = find_passes(
+		satellites, wgs84.latlon(*lat_lon), TS.tt_jd(t0_tt), TS.tt_jd(t1_tt),
+		altitude_degrees)
+	return sat_idx, t_rise.tt, t_peak.tt, t_set.tt
+
+
+def find_passes_parallel(
+		satellites: List[EarthSatellite],
+		locations: List[GeographicPosition],
+		t0: Time,
+		t1: Time,
+		altitude_degrees: Union[float, np.ndarray] = 0.0,
+		max_workers: Union[int, None] = None
+) -> List[Tuple[np.ndarray, Time, Time, Time]]:
+	"""
+	Return the output of find_passes() for each of a set of ground locations, with the
+	locations shared out between a pool of processes. When there are fewer locations
+	than processes, the satellites are also split into groups, so that every process
+	has work to do.
+
+	Satrec objects can't be pickled, so each worker rebuilds the satellites from their
+	TLE lines. Scripts calling this must do so from within an
+	``if __name__ == "__main__":`` block.
+
+	:param satellites: List of EarthSatellite objects
+	:param locations: List of ground locations (WGS84, zero elevation)
+	:param t0: Time horizon start
+	:param t1: Time horizon end
+	:param altitude_degrees: Minimum elevation of a pass, either a single value or
+		one per satellite (degrees)
+	:param max_workers: Maximum number of processes (defaults to the number of CPUs)
+	:return: List, in the same order as locations, of find_passes() outputs
+	"""
+	tles = [(s.name, *export_tle(s.model)) for s in satellites]
+	altitude_degrees = np.broadcast_to(
+		np.asarray(altitude_degrees, dtype=float), (len(satellites),))
+
+	# Contiguous groups of satellites, as (start, end) indices, searched by each task
+	max_workers = max_workers or os.cpu_count()
+	n_groups = max(1, min(len(satellites), -(-max_workers // max(1, len(locations)))))
+	bounds = np.linspace(0, len(satellites), n_groups + 1).astype(int)
+	groups = list(zip(bounds[:-1], bounds[1:]))
+
+	with ProcessPoolExecutor(max_workers) as executor:
+		futures = [
+			[
+				executor.submit(
+					_find_passes_from_tles, tles[start:end],
+					(loc.latitude.degrees, loc.longitude.degrees), t0.tt, t1.tt,
+					altitude_degrees[start:end])
+				for start, end in groups
+			]
+			for loc in locations
+		]
+		passes = []
+		for loc_futures in futures:
+			# Join the passes of each group of satellites, with the satellite indices
+			# offset back into the full list (keeping them ordered by satellite)
+			sat_idx, t_rise, t_peak, t_set = zip(*(future.result() for future in loc_futures))
+			passes.append((
+				np.concatenate([idx + start for idx, (start, _) in zip(sat_idx, groups)]),
+				TS.tt_jd(np.concatenate(t_rise)),
+				TS.tt_jd(np.concatenate(t_peak)),
+				TS.tt_jd(np.concatenate(t_set))
+			))
+	return passes
 
 
 def fetch_tle_and_write_to_txt(
@@ -114,23 +598,60 @@ def fetch_tle_and_write_to_txt(
 		text_file.write(tle_response.text)
 
 
+@lru_cache(maxsize=None)
+def get_tle_file(
+		platform: str,
+		start_time: str,
+		end_time: str
+) -> str:
+	"""
+	Return the path of the file holding the TLEs of a platform between two dates, first
+	fetching them if the file doesn't already exist. Paths that have already been checked
+	(or fetched) are remembered, so repeated calls don't go back to the file system.
+	:param platform: Name of the platform, matching a file in the norad_ids directory
+	:param start_time: Start date (YYYY-MM-DD)
+	:param end_time: End date (YYYY-MM-DD)
+	:return:
+	"""
+	file_tle = f"tle_data//{platform}_tle_{start_time}_{end_time}.txt"
+	if not os.path.isfile(file_tle):  # Skip if we already have this data
+		file_norad = f"norad_ids//{platform}_ids.txt"
+		fetch_tle_and_write_to_txt(file_tle, file_norad, start_time, end_time)
+	return file_tle
+
+
+@lru_cache(maxsize=None)
+def load_tle_file(file_with_tle_data: str) -> Tuple[EarthSatellite, ...]:
+	"""
+	Return the satellites parsed from a file of TLEs. Files are only parsed the first
+	time they're asked for, and the same satellites returned after that, so a process
+	that searches the same TLEs more than once (e.g. for different epochs) parses them
+	once.
+	:param file_with_tle_data: Path to the TLE file, as returned by get_tle_file()
+	:return:
+	"""
+	return tuple(load.tle_file(file_with_tle_data, ts=TS))
+
+
 def get_satellites_closest_to_epoch(
 		file_with_tle_data: str,
 		epoch: Timescale
 ) -> Dict[str, EarthSatellite]:
+	epoch_tt = epoch.tt
 	satellites_best_epoch = {}
-	for s in load.tle_file(file_with_tle_data):
+	best_epoch_tt = {}  # Epoch (TT) of the TLE stored for each satellite
+	for s in load_tle_file(file_with_tle_data):
+		s_epoch_tt = s.epoch.tt
 		# If our TLE epoch is greater than the time from which we're considering
 		# images to be "valuable", skip since we need something earlier
-		if s.epoch.tt > epoch.tt:
-			continue
-		# If we've not yet stored a TLE for this satellite, do so
-		if s.model.satnum not in satellites_best_epoch:
-			satellites_best_epoch[s.model.satnum] = s
+		if s_epoch_tt > epoch_tt:
 			continue
-		# If this TLE is later than the one we currently have, overwrite it
-		if s.epoch.tt > satellites_best_epoch[s.model.satnum].epoch.tt:
-			satellites_best_epoch[s.model.satnum] = s
+		# If we've not yet stored a TLE for this satellite, or this TLE is later than
+		# the one we currently have, store it
+		satnum = s.model.satnum
+		if s_epoch_tt > best_epoch_tt.get(satnum, -np.inf):
+			satellites_best_epoch[satnum] = s
+			best_epoch_tt[satnum] = s_epoch_tt
 	return satellites_best_epoch
 
 
@@ -144,32 +665,23 @@ def get_spacecraft_from_epoch(
 	pre_epoch_time_str = str(pre_epoch_time)[0:10]
 	end_time_str = str(end_time)[0:10]
 
-	file_tle = f"tle_data//{platform}_tle_{pre_epoch_time_str}_{end_time_str}.txt"
-	if not os.path.isfile(file_tle):  # Skip if we already have this data
-		file_norad = f"norad_ids//{platform}_ids.txt"
-		fetch_tle_and_write_to_txt(file_tle, file_norad, pre_epoch_time_str, end_time_str)
+	file_tle = get_tle_file(platform, pre_epoch_time_str, end_time_str)
 
 	# For each satellite platform, extract the EarthSatellite object with an epoch
 	# closest to (but no later than) the earliest time at which data is considered to be
 	# of value
 	satellites_best_epoch = get_satellites_closest_to_epoch(
 		file_tle,
-		load.timescale().from_datetime(epoch.astimezone(utc))
+		TS.from_datetime(epoch.astimezone(utc))
 	)
 
 	# Create Spacecraft objects for each item in the TLE dataset
 	spacecraft_all = []
 	for satellite_id, satellite in satellites_best_epoch.items():
+		platform_type = get_platform_type(satellite.name)
 		spacecraft_all.append(Spacecraft(
 			satellite,
-			[  # Field of regard (half angle, radians)
-				# we are associating all keys in PLATFORM_ATTRIBS["for"] with 'x' and then itterating over them
-				PLATFORM_ATTRIBS["for"][x] for x in PLATFORM_ATTRIBS["for"]
-				if x in satellite.name
-			][0],
-			[  # Probability a location within the FoR will be acquired
-				PLATFORM_ATTRIBS["aq_prob"][x] for x in PLATFORM_ATTRIBS["aq_prob"]
-				if x in satellite.name
-			][0]
+			PLATFORM_ATTRIBS["for"][platform_type],  # Field of regard (half angle, radians)
+			PLATFORM_ATTRIBS["aq_prob"][platform_type]  # Probability a location within the FoR will be acquired
 		))
 	return spacecraft_all
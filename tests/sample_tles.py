@@ -0,0 +1,20 @@
+from skyfield.api import EarthSatellite
+
+from timescale import TS
+
+# Sun-synchronous (FLOCK-like) and ISS-like orbits, with epochs at the start of the search
+TLES = [
+	(
+		"FLOCK 4P 1",
+		"1 47463U 21006AB  22310.50000000  .00010000  00000-0  50000-3 0  9991",
+		"2 47463  97.4500  20.0000 0010000 100.0000 260.0000 15.20000000 10000"),
+	(
+		"FLOCK 4P 2",
+		"1 47464U 21006AC  22310.50000000  .00010000  00000-0  50000-3 0  9991",
+		"2 47464  97.4500  21.0000 0010000 100.0000 200.0000 15.20000000 10000"),
+	(
+		"ISS (ZARYA)",
+		"1 25544U 98067A   22310.50000000  .00016717  00000-0  10270-3 0  9005",
+		"2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391563537"),
+]
+SATELLITES = [EarthSatellite(line1, line2, name, TS) for name, line1, line2 in TLES]
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("netCDF4")
+from Astrid import _between, mean_cloud_fraction_in_box
+
+ASCENDING = np.array([-1.0, -0.5, 0.0, 0.5, 1.0])
+
+
+@pytest.mark.parametrize("axis", [ASCENDING, ASCENDING[::-1]])
+@pytest.mark.parametrize("low, high, expected", [
+	(-0.5, 0.5, [0.0]),  # Bounds on the grid are excluded
+	(-0.6, 0.6, [-0.5, 0.0, 0.5]),
+	(-2.0, 2.0, [-1.0, -0.5, 0.0, 0.5, 1.0]),
+	(0.1, 0.4, []),
+	(1.0, 2.0, []),
+])
+def test_between(axis, low, high, expected):
+	assert sorted(axis[_between(axis, low, high)]) == expected
+
+
+def test_mean_cloud_fraction_in_box():
+	# Latitudes descending, as in the cloud files, and longitudes ascending
+	lats, lons = ASCENDING[::-1], ASCENDING
+	cfc = np.arange(25, dtype=float).reshape(1, 5, 5)
+	# Latitudes 0.5, 0 & -0.5 (rows 1 to 3) and longitudes 0 & 0.5 (columns 2 & 3)
+	assert mean_cloud_fraction_in_box(lats, lons, cfc, 0.0, 0.3, 0.6) \
+		== np.mean(cfc[0, 1:4, 2:4])
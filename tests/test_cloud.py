@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from classes import ContactArray, Location
+from cloud import extract_cloud_data, get_cloud_cover_at_time
+from data_movement import probability_no_image_from_set
+from timescale import TS
+
+ROWS = [
+	("2022-11-05 22:00:00", 85),
+	("2022-11-05 23:00:00", 24),
+	("2022-11-06 00:00:00", 0),
+	("2022-11-06 11:00:00", 29),
+	("2022-11-06 12:00:00", 30),
+	("2022-11-06 13:00:00", 100),
+]
+
+
+@pytest.fixture
+def weather_csv(tmp_path):
+	# In the format of the openweathermap files in the weather directory
+	path = tmp_path / "Somewhere.csv"
+	lines = ["dt,dt_iso,timezone,city_name,lat,lon,temp,clouds_all"]
+	for time_, cloud in ROWS:
+		dt = int(datetime.fromisoformat(time_ + "+00:00").timestamp())
+		lines.append(f"{dt},{time_} +0000 UTC,0,Somewhere,0,0,280.1,{cloud}")
+	path.write_text("\n".join(lines) + "\n")
+	return str(path)
+
+
+def test_extract_cloud_data(weather_csv):
+	# Samples at the start & end times are included
+	clouds = extract_cloud_data(
+		weather_csv, datetime(2022, 11, 5, 23), datetime(2022, 11, 6, 12))
+	expected_tt = [
+		TS.utc(*datetime.fromisoformat(t).timetuple()[:4]).tt for t, _ in ROWS[1:5]]
+	np.testing.assert_array_equal(clouds.tt, expected_tt)
+	assert clouds.pct.dtype == np.uint8
+	np.testing.assert_array_equal(clouds.pct, [24, 0, 29, 30])
+
+	# Each time takes the cover of the first sample after it, or the last sample
+	t = np.array(expected_tt) + [-0.01, 0.01, 0, 1]
+	np.testing.assert_array_equal(get_cloud_cover_at_time(t, clouds), [24, 29, 30, 30])
+
+
+@pytest.mark.parametrize("cloud_threshold, used", [(0.29, True), (0.28, False), (1.0, True)])
+def test_cloud_threshold_boundary(weather_csv, cloud_threshold, used):
+	# A daytime image with 29% cloud is used with a threshold of 0.29, even though
+	# 0.29 * 100 is just below 29 in floating point
+	clouds = extract_cloud_data(weather_csv, datetime(2022, 11, 5), datetime(2022, 11, 7))
+	t_image = TS.utc(2022, 11, 6, 10, 30).tt
+	images = ContactArray([0], [1.0], [t_image], [t_image], [t_image])
+	downloads = {0: np.array([t_image + 0.01])}
+	p_no_image = probability_no_image_from_set(
+		images, Location("Somewhere", (51.5, 0.0)), downloads, TS.tt_jd(t_image + 1),
+		clouds, cloud_threshold)
+	assert p_no_image == (pytest.approx(1 - 0.75 * 0.71) if used else 1.)
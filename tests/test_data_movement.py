@@ -0,0 +1,125 @@
+from bisect import bisect
+
+import numpy as np
+import pytest
+
+from classes import ContactArray, Location, Spacecraft
+from cloud import CloudSeries
+from data_movement import DOWNLOAD_FREQ, DOWNLOAD_PROBABILITY, MAX_DOWNLOADS_CONSIDERED, \
+	T_MAX, T_MIN, get_contact_events, get_contact_events_parallel, prob_of_data_by_time, \
+	probability_no_image_from_set
+from sample_tles import SATELLITES
+from space import sun_elevation
+from timescale import TS
+
+SPACECRAFT = [Spacecraft(s, aq_prob=p) for s, p in zip(SATELLITES, (1.0, 0.1, 0.5))]
+STATIONS = [
+	Location("Iceland", (64.872589, -22.379039)),
+	Location("Awarura", (-46.528890, 168.381881)),
+]
+T0, T1 = TS.utc(2022, 11, 6, 12), TS.utc(2022, 11, 8, 12)
+TOL = 1 / 86400  # One second (days)
+
+
+@pytest.mark.parametrize("is_target", [False, True])
+def test_contact_events_parallel_matches_serial(is_target):
+	contacts = get_contact_events_parallel(
+		SPACECRAFT, STATIONS, T0, T1, is_target, max_workers=4)
+	assert len(contacts) == len(STATIONS)
+	for station, found in zip(STATIONS, contacts):
+		expected = get_contact_events(SPACECRAFT, station, T0, T1, is_target)
+		assert len(expected)
+		np.testing.assert_array_equal(found.sat_id, expected.sat_id)
+		np.testing.assert_array_equal(found.aq_prob, expected.aq_prob)
+		for name in ("t_rise", "t_peak", "t_set"):
+			np.testing.assert_allclose(
+				getattr(found, name), getattr(expected, name), rtol=0, atol=TOL)
+
+
+# Hand-built images & downloads, over a day ending at T_DAY0. Satellite 0 downloads
+# every 0.04 days, the last exactly at T_DAY0, satellite 1 never downloads, and satellite
+# 2 stops downloading part way through the day
+T_DAY0 = TS.utc(2022, 11, 12, 5).tt
+DOWNLOADS = {
+	0: T_DAY0 - 0.04 * np.arange(25)[::-1],
+	2: T_DAY0 - 1 + np.array([0.1, 0.2, 0.3, 0.35, 0.5]),
+}
+T_IMAGE = T_DAY0 - 1 + np.array([0.02, 0.03, 0.05, 0.16, 0.2, 0.24, 0.45, 0.6, 0.68, 0.7, 0.9])
+T_IMAGE[3] = DOWNLOADS[0][3]  # An image taken at the end of a download
+IMAGES = ContactArray(
+	[0, 1, 2, 0, 2, 0, 2, 1, 0, 2, 0],
+	[0.6, 0.1, 0.5, 0.6, 0.5, 0.6, 0.5, 0.1, 0.6, 0.5, 0.6],
+	T_IMAGE - 2 / 1440, T_IMAGE, T_IMAGE + 2 / 1440)
+TARGET = Location("Bangalore", (12.97, 77.59))
+CLOUDS = CloudSeries(
+	T_DAY0 - 1 + np.arange(0, 1.01, 1 / 24), np.resize(np.uint8([0, 29, 30, 100, 5, 60]), 25))
+
+
+def scalar_prob_of_data_by_time(t_image, t_downloads, t_arrival):
+	"""
+	Probability of an image having arrived by t_arrival, one download at a time as the
+	original (per Contact) implementation found it
+	"""
+	downloads_trimmed = [d for d in t_downloads if d > t_image][::DOWNLOAD_FREQ]
+	total = 0.
+	for k in range(min(MAX_DOWNLOADS_CONSIDERED, len(downloads_trimmed))):
+		d = downloads_trimmed[k]
+		if t_arrival <= d + T_MIN:
+			p = 0.
+		elif t_arrival >= d + T_MAX:
+			p = 1.
+		else:
+			p = (t_arrival - (d + T_MIN)) / ((d + T_MAX) - (d + T_MIN))
+		total += DOWNLOAD_PROBABILITY[MAX_DOWNLOADS_CONSIDERED][k] * p
+	return total
+
+
+def scalar_probability_no_image(images, downloads, cloud_threshold):
+	"""
+	Probability of no image having arrived by T_DAY0, one image at a time, skipping those
+	taken at night or with too much cloud
+	"""
+	p_no_image = 1.
+	for k in range(len(images)):
+		t_peak = images.t_peak[k]
+		if sun_elevation(TS.tt_jd(t_peak), TARGET.location) <= 0:
+			continue
+		cloud = CLOUDS.pct[min(bisect(list(CLOUDS.tt), t_peak), len(CLOUDS.tt) - 1)] / 100
+		if cloud > cloud_threshold:
+			continue
+		p_delivered = scalar_prob_of_data_by_time(
+			t_peak, downloads.get(images.sat_id[k], []), T_DAY0)
+		p_no_image *= 1 - p_delivered * (1. - cloud) * images.aq_prob[k]
+	return p_no_image
+
+
+@pytest.mark.parametrize("sat_id", [0, 1, 2])
+def test_prob_of_data_by_time_matches_scalar(sat_id):
+	t_downloads = DOWNLOADS.get(sat_id, np.empty(0))
+	t_image = np.append(IMAGES.t_peak, [T_DAY0 - 0.5, T_DAY0])
+	expected = [scalar_prob_of_data_by_time(t, t_downloads, T_DAY0) for t in t_image]
+	# Julian dates hold times to within about 1e-10 days, and the ramp is 5/24 days long
+	np.testing.assert_allclose(
+		prob_of_data_by_time(t_image, t_downloads, T_DAY0), expected, rtol=0, atol=1e-8)
+	if sat_id == 0:
+		# Covers the ramp's ends, its middle and no download before T_DAY0
+		assert min(expected) == 0. and max(expected) == 1.
+		assert any(0 < p < 1 for p in expected)
+	else:
+		# Never downloaded, or (for the last two) taken after the last download
+		assert expected[-2:] == [0., 0.]
+
+
+@pytest.mark.parametrize("cloud_threshold", [1.0, 0.3, 0.29, 0.0])
+def test_probability_no_image_matches_scalar(cloud_threshold):
+	found = probability_no_image_from_set(
+		IMAGES, TARGET, DOWNLOADS, TS.tt_jd(T_DAY0), CLOUDS, cloud_threshold)
+	expected = scalar_probability_no_image(IMAGES, DOWNLOADS, cloud_threshold)
+	assert found == pytest.approx(expected, rel=0, abs=1e-8)
+
+
+def test_probability_no_image_with_nothing_delivered():
+	# Satellite 1 never downloads, so its images can't have arrived
+	only_sat_1 = IMAGES[IMAGES.sat_id == 1]
+	assert probability_no_image_from_set(
+		only_sat_1, TARGET, DOWNLOADS, TS.tt_jd(T_DAY0), CLOUDS) == 1.
@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+import pytest
+import skyfield.tests
+from skyfield.api import load_file, wgs84
+
+from sample_tles import SATELLITES
+from space import find_passes, find_passes_parallel, sun_elevation
+from timescale import TS
+
+LOCATION = wgs84.latlon(39.7, -104.9)
+ALTITUDE = 10.0
+TOL = 1 / 86400  # One second (days)
+
+
+def events_as_passes(satellites, t0, t1):
+	"""
+	Passes found by Skyfield's find_events, as (satellite, rise, peak, set) Julian dates
+	(TT). Passes that have already risen, or peaked, at t0 rise (and peak) at t0, while
+	those that haven't set by t1 are left out
+	"""
+	passes = []
+	for k, satellite in enumerate(satellites):
+		t_rise = t_peak = t0.tt
+		t, events = satellite.find_events(LOCATION, t0, t1, altitude_degrees=ALTITUDE)
+		for ti, event in zip(t.tt, events):
+			if event == 0:
+				t_rise = t_peak = ti
+			elif event == 1:
+				t_peak = ti
+			else:
+				passes.append((k, t_rise, t_peak, ti))
+				t_rise = t_peak = t0.tt
+	return sorted(passes)
+
+
+def reference_passes():
+	t0, t1 = TS.utc(2022, 11, 6, 12), TS.utc(2022, 11, 9, 12)
+	return t0, t1, events_as_passes(SATELLITES, t0, t1)
+
+
+def assert_same_passes(t0, t1):
+	expected = events_as_passes(SATELLITES, t0, t1)
+	sat_idx, t_rise, t_peak, t_set = find_passes(SATELLITES, LOCATION, t0, t1, ALTITUDE)
+	found = sorted(zip(sat_idx.tolist(), t_rise.tt, t_peak.tt, t_set.tt))
+	assert len(found) == len(expected)
+	np.testing.assert_array_equal([p[0] for p in found], [p[0] for p in expected])
+	np.testing.assert_allclose(
+		[p[1:] for p in found], [p[1:] for p in expected], rtol=0, atol=TOL)
+
+
+def test_find_passes_matches_find_events():
+	t0, t1, _ = reference_passes()
+	assert_same_passes(t0, t1)
+
+
+@pytest.mark.parametrize("offset_s", [-17, 30, 120])
+def test_find_passes_with_pass_across_start(offset_s):
+	# Start the horizon during a pass, before (negative offset) or after its peak
+	_, t1, passes = reference_passes()
+	_, t_rise, t_peak, t_set = passes[len(passes) // 2]
+	t0 = TS.tt_jd(t_peak + offset_s / 86400)
+	assert t_rise < t0.tt < t_set
+	assert_same_passes(t0, t1)
+
+
+@pytest.mark.parametrize("offset_s", [-20, 20])
+def test_find_passes_with_pass_across_end(offset_s):
+	# End the horizon just before, or just after, a pass sets
+	t0, _, passes = reference_passes()
+	_, _, _, t_set = passes[len(passes) // 2]
+	assert_same_passes(t0, TS.tt_jd(t_set + offset_s / 86400))
+
+
+@pytest.mark.parametrize("max_workers", [2, 4, 5])
+def test_find_passes_parallel_matches_serial(max_workers):
+	# With fewer locations than workers, the satellites are split into groups, whose
+	# passes must be joined back together in the same order
+	t0, t1, _ = reference_passes()
+	locations = [LOCATION, wgs84.latlon(-33.9, 18.4)]
+	altitudes = np.array([10.0, 20.0, 5.0])
+	found = find_passes_parallel(SATELLITES, locations, t0, t1, altitudes, max_workers)
+	assert len(found) == len(locations)
+	for location, (sat_idx, t_rise, t_peak, t_set) in zip(locations, found):
+		expected = find_passes(SATELLITES, location, t0, t1, altitudes)
+		assert len(expected[0])
+		np.testing.assert_array_equal(sat_idx, expected[0])
+		for t, t_expected in zip((t_rise, t_peak, t_set), expected[1:]):
+			np.testing.assert_allclose(t.tt, t_expected.tt, rtol=0, atol=TOL)
+
+
+def test_sun_elevation_matches_ephemeris():
+	# Skyfield ships a one-day excerpt of the DE430 ephemeris with its tests
+	ephemeris = os.path.join(
+		os.path.dirname(skyfield.tests.__file__), "data", "de430-2015-03-02.bsp")
+	if not os.path.exists(ephemeris):
+		pytest.skip("Skyfield's test ephemeris isn't installed")
+	planets = load_file(ephemeris)
+	t = TS.utc(2015, 3, 2, np.arange(0, 24, 0.5))
+	for location in (LOCATION, wgs84.latlon(-33.9, 18.4), wgs84.latlon(69.6, -139.0)):
+		alt, _, _ = (planets["earth"] + location).at(t).observe(planets["sun"]) \
+			.apparent().altaz()
+		np.testing.assert_allclose(sun_elevation(t, location), alt.degrees, rtol=0, atol=1)
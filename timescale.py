@@ -0,0 +1,6 @@
+from skyfield.api import load
+
+# Loading a timescale parses the leap second and Delta T tables, so it's done once, here,
+# and shared by every module (and script) that creates Skyfield Times or loads TLEs.
+# The tables are those built into Skyfield, so nothing is read from, or fetched to, disk
+TS = load.timescale(builtin=True)